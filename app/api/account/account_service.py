@@ -1,6 +1,5 @@
-from datetime import timedelta
-
 from fastapi import HTTPException, status
+from pymongo.errors import DuplicateKeyError
 
 from app.db.mongo_driver import user_collection
 from app.lib.auth.auth_models import Roles
@@ -10,39 +9,37 @@ from app.api.account.account_models import RegisterAccountResponse
 from app.lib.auth.auth_service import (
     authenticate_user,
     get_password_hash,
-    create_access_token,
-    ACCESS_TOKEN_EXPIRE_MINUTES
+    create_user_access_token
 )
 
 
 async def create_new_account(email, password):
-    user = await user_collection.find_one({"email": "email"})
-    if not user:
-        user_data = {
-            "email": email,
-            "hashed_password": get_password_hash(password),
-            "disabled": False,
-            "roles": [Roles.BASE_USER],
-            "friends": [],
-            "blockedUsers": [],
-            "friendRequests": [],
-            "banReason": None,
-            "banMsg": None,
-            "bannerId": None
-        }
+    user_data = {
+        "email": email,
+        "hashed_password": await get_password_hash(password),
+        "disabled": False,
+        "roles": [Roles.BASE_USER],
+        "banReason": None,
+        "banMsg": None,
+        "bannerId": None,
+        "tokenVersion": 0
+    }
 
+    # The unique email index rejects duplicates, no need to look first.
+    try:
         await user_collection.insert_one(
             user_data
         )
-
+    except DuplicateKeyError:
         return RegisterAccountResponse(
-            account_details={"email": email, "password": password},
-            success=True,
-            msg="User has been successfully created."
+            success=False,
+            msg="Email already exists."
         )
+
     return RegisterAccountResponse(
-        success=False,
-        msg="Email already exists."
+        account_details={"email": email, "password": password},
+        success=True,
+        msg="User has been successfully created."
     )
 
 
@@ -60,10 +57,7 @@ async def login_account(username, password):
             detail="Banned user",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
+    access_token = create_user_access_token(user)
     return {"access_token": access_token, "token_type": "bearer"}
 
 
@@ -9,7 +9,9 @@ from app.api.admin.admin_models import (
 
 from app.lib.auth.auth_models import (
     Roles,
-    User
+    User,
+    Principal,
+    PasswordHashingStatsModel
 )
 
 from app.api.admin.admin_service import (
@@ -17,7 +19,10 @@ from app.api.admin.admin_service import (
     show_all_users
 )
 
-from app.lib.auth.auth_service import get_user_with_roles
+from app.lib.auth.auth_service import (
+    get_user_with_roles,
+    get_password_hashing_stats
+)
 
 admin_router = APIRouter()
 
@@ -25,13 +30,23 @@ admin_router = APIRouter()
 @admin_router.post("/ban-users", response_model=BanUsersResponseModel)
 async def ban_users(
     request: BanUsersRequestModel,
-    user: User = Depends(get_user_with_roles([Roles.ADMIN]))
+    user: Principal = Depends(get_user_with_roles([Roles.ADMIN]))
 ):
     return await disable_user_accounts_by_email_and_id(user, request)
 
 
 @admin_router.post("/retrieve-users", response_model=List[User])
 async def retrieve_users(
-    user: User = Depends(get_user_with_roles([Roles.ADMIN]))
+    user: Principal = Depends(get_user_with_roles([Roles.ADMIN]))
 ):
     return await show_all_users()
+
+
+@admin_router.get(
+    "/password-hashing-stats",
+    response_model=PasswordHashingStatsModel
+)
+async def retrieve_password_hashing_stats(
+    user: Principal = Depends(get_user_with_roles([Roles.ADMIN]))
+):
+    return get_password_hashing_stats()
@@ -1,12 +1,13 @@
 
 from app.api.admin.admin_models import BanUsersRequestModel
-from app.lib.auth.auth_models import User
+from app.lib.auth.auth_models import Principal
+from app.lib.auth.auth_service import revoke_user_tokens
 from app.db.mongo_driver import user_collection
 from pymongo import UpdateOne
 
 
 async def disable_user_accounts_by_email_and_id(
-    admin: User,
+    admin: Principal,
     request: BanUsersRequestModel
 ):
     ids_to_ban_model = {}
@@ -51,7 +52,8 @@ async def disable_user_accounts_by_email_and_id(
                 "banReason": user["banReason"],
                 "disabled": True,
                 "bannerId": admin.id
-            }
+            },
+            "$inc": {"tokenVersion": 1}
         }
 
         writes.append(UpdateOne(
@@ -61,6 +63,7 @@ async def disable_user_accounts_by_email_and_id(
 
     if banned_user_ids:
         count = (await user_collection.bulk_write(writes)).modified_count
+        await revoke_user_tokens(users)
 
     return {
         "count": count,
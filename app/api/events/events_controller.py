@@ -0,0 +1,27 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header
+from fastapi.responses import StreamingResponse
+
+from app.api.events.events_service import stream_user_events
+
+from app.lib.auth.auth_models import Principal, Roles
+from app.lib.auth.auth_service import get_user_with_roles
+
+events_router = APIRouter()
+
+
+# Server-Sent Events stream of dateProposal, dateAccepted, dateRejected and
+# friendRequest events for the current user, replaces polling list-dates
+# and view-friend-requests. Browsers reconnect with the id of the last event
+# they received in Last-Event-ID, events since then are replayed first.
+@events_router.get("/events")
+async def user_events(
+    user: Principal = Depends(get_user_with_roles([Roles.BASE_USER])),
+    last_event_id: Optional[str] = Header(None)
+):
+    return StreamingResponse(
+        stream_user_events(user, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,34 @@
+import asyncio
+import json
+from typing import Optional
+
+from app.lib.auth.auth_models import Principal
+from app.lib.events.event_broker import event_broker
+from app.settings import settings
+
+
+def _format_event(message: dict):
+    return f"id: {message['id']}\n" \
+           f"event: {message['type']}\n" \
+           f"data: {json.dumps(message['data'])}\n\n"
+
+
+async def stream_user_events(
+    user: Principal,
+    last_event_id: Optional[str] = None
+):
+    with event_broker.subscribe(user.id, last_event_id) as queue:
+        yield f"retry: {int(settings.EVENTS_RECONNECT_SECONDS * 1000)}\n\n"
+
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    queue.get(),
+                    settings.EVENTS_KEEPALIVE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                # Comment line, keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+
+            yield _format_event(message)
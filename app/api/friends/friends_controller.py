@@ -1,13 +1,20 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+
+from app.db.model_utils import PyObjectId
 
 from app.api.friends.friends_models import (
     OperationOnUserModel,
     FriendRequestResponseModel,
     BlockUserResponseModel,
     FriendRequestAcceptedResponse,
-    FriendRemovedResponse
+    FriendRemovedResponse,
+    FriendRequestModel,
+    FriendRequestCountModel,
+    BulkFriendOperationsModel,
+    BulkFriendOperationResult,
+    FriendSuggestionModel
 )
 
 from app.api.friends.friends_service import (
@@ -15,11 +22,15 @@ from app.api.friends.friends_service import (
     add_user_to_friends_list,
     add_to_friend_requests_of_user,
     show_all_friend_requests,
-    remove_friend_from_list
+    count_friend_requests,
+    remove_friend_from_list,
+    apply_bulk_friend_operations,
+    get_friend_suggestions
 )
 
 from app.lib.auth.auth_service import get_user_with_roles
-from app.lib.auth.auth_models import Roles, User
+from app.lib.auth.auth_models import Roles, Principal
+from app.settings import settings
 
 friends_router = APIRouter()
 
@@ -30,7 +41,7 @@ friends_router = APIRouter()
 )
 async def block_user(
     request: OperationOnUserModel,
-    user: User = Depends(get_user_with_roles([Roles.BASE_USER]))
+    user: Principal = Depends(get_user_with_roles([Roles.BASE_USER]))
 ):
     return await add_user_to_block_list(user, request)
 
@@ -41,7 +52,7 @@ async def block_user(
 )
 async def send_friend_request(
     request: OperationOnUserModel,
-    user: User = Depends(get_user_with_roles([Roles.BASE_USER]))
+    user: Principal = Depends(get_user_with_roles([Roles.BASE_USER]))
 ):
     return await add_to_friend_requests_of_user(user, request)
 
@@ -52,7 +63,7 @@ async def send_friend_request(
 )
 async def accept_friend_request(
     request: OperationOnUserModel,
-    user: User = Depends(get_user_with_roles([Roles.BASE_USER]))
+    user: Principal = Depends(get_user_with_roles([Roles.BASE_USER]))
 ):
     return await add_user_to_friends_list(user, request)
 
@@ -63,16 +74,50 @@ async def accept_friend_request(
 )
 async def remove_friend(
     request: OperationOnUserModel,
-    user: User = Depends(get_user_with_roles([Roles.BASE_USER]))
+    user: Principal = Depends(get_user_with_roles([Roles.BASE_USER]))
 ):
     return await remove_friend_from_list(user, request)
 
 
 @friends_router.get(
     "/view-friend-requests",
-    response_model=List[OperationOnUserModel]
+    response_model=List[FriendRequestModel]
 )
 async def view_friend_requests(
-    user: User = Depends(get_user_with_roles([Roles.BASE_USER]))
+    user: Principal = Depends(get_user_with_roles([Roles.BASE_USER])),
+    limit: int = Query(50, gt=0, le=200),
+    after: Optional[PyObjectId] = Query(None)
+):
+    return await show_all_friend_requests(user, limit, after)
+
+
+@friends_router.get(
+    "/count-friend-requests",
+    response_model=FriendRequestCountModel
+)
+async def count_pending_friend_requests(
+    user: Principal = Depends(get_user_with_roles([Roles.BASE_USER]))
+):
+    return await count_friend_requests(user)
+
+
+@friends_router.post(
+    "/bulk",
+    response_model=List[BulkFriendOperationResult]
+)
+async def bulk_friend_operations(
+    request: BulkFriendOperationsModel,
+    user: Principal = Depends(get_user_with_roles([Roles.BASE_USER]))
+):
+    return await apply_bulk_friend_operations(user, request)
+
+
+@friends_router.get(
+    "/suggestions",
+    response_model=List[FriendSuggestionModel]
+)
+async def friend_suggestions(
+    user: Principal = Depends(get_user_with_roles([Roles.BASE_USER])),
+    limit: int = Query(10, gt=0, le=settings.FRIEND_SUGGESTIONS_LIMIT)
 ):
-    return await show_all_friend_requests(user)
+    return await get_friend_suggestions(user, limit)
@@ -1,9 +1,17 @@
-from typing import Optional
-from datetime import date
+from typing import List, Optional
+from datetime import date, datetime
+from enum import Enum
 
 from pydantic import Field
 
-from app.db.model_utils import CustomModel
+from app.db.model_utils import CustomModel, PyObjectId
+
+
+class RelationshipKind(str, Enum):
+    FRIEND = "friend"
+    BLOCKED = "blocked"
+    # Owned by the receiver, the target is whoever sent the request
+    FRIEND_REQUEST = "friendRequest"
 
 
 class OperationOnUserModel(CustomModel):
@@ -32,3 +40,47 @@ class BlockUserResponseModel(CustomModel):
     date_blocked: date = Field(default=date.today(), alias="dateBlocked")
     msg: str = Field(...)
 
+
+class FriendRequestModel(CustomModel):
+    # Edge id, pass the last one back as ``after`` to fetch the next page
+    id: PyObjectId = Field(...)
+    email: str = Field(...)
+    msg: Optional[str] = Field(default="")
+    requested_at: datetime = Field(..., alias="requestedAt")
+
+
+class FriendRequestCountModel(CustomModel):
+    count: int = Field(...)
+
+
+class FriendOperation(str, Enum):
+    BLOCK = "block"
+    SEND_FRIEND_REQUEST = "sendFriendRequest"
+    ACCEPT_FRIEND_REQUEST = "acceptFriendRequest"
+    REJECT_FRIEND_REQUEST = "rejectFriendRequest"
+    REMOVE_FRIEND = "removeFriend"
+
+
+class BulkFriendOperationItem(OperationOnUserModel):
+    operation: FriendOperation = Field(...)
+
+
+class BulkFriendOperationsModel(CustomModel):
+    operations: List[BulkFriendOperationItem] = Field(
+        ...,
+        min_items=1,
+        max_items=100
+    )
+
+
+class BulkFriendOperationResult(CustomModel):
+    email: str = Field(...)
+    operation: FriendOperation = Field(...)
+    success: bool = Field(...)
+    msg: str = Field(...)
+
+
+class FriendSuggestionModel(CustomModel):
+    id: PyObjectId = Field(...)
+    email: str = Field(...)
+    mutual_friends: int = Field(..., alias="mutualFriends")
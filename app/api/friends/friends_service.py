@@ -1,23 +1,58 @@
+import asyncio
 from datetime import date
+from typing import Optional
 
 from fastapi import HTTPException, status
+from pymongo.errors import PyMongoError
 
 from app.api.friends.friends_models import (
     OperationOnUserModel,
+    RelationshipKind,
+    FriendOperation,
+    BulkFriendOperationItem,
+    BulkFriendOperationsModel
 )
-from app.lib.auth.auth_models import User
+from app.api.friends.relationship_service import (
+    link,
+    unlink,
+    apply_relationship_writes,
+    add_relationship,
+    remove_relationship,
+    relationship_kinds,
+    blocked_between,
+    relationships_between,
+    list_relationships,
+    count_relationships,
+    mutual_friend_counts,
+    relationship_target_ids,
+    relationship_owner_ids
+)
+from app.lib.auth.auth_models import Principal
+from app.lib.misc.cache import TTLCache
+from app.lib.events.event_broker import event_broker
+from app.db.model_utils import PyObjectId
 from app.db.mongo_driver import user_collection
+from app.settings import settings
+
+# Friend suggestions keyed by user id. Only the two users on either end of
+# a changed edge are invalidated, friends of theirs whose mutual counts
+# shift pick the change up when their entry expires.
+suggestions_cache = TTLCache(
+    settings.FRIEND_SUGGESTIONS_CACHE_MAX_ENTRIES,
+    settings.FRIEND_SUGGESTIONS_CACHE_TTL_SECONDS
+)
 
 
-def _pop_and_return(v, x: list):
-    for index, val in enumerate(x):
-        if val == v:
-            x.pop(index)
-            return x
+def _invalidate_suggestions(*user_ids: PyObjectId):
+    for user_id in user_ids:
+        suggestions_cache.invalidate(user_id)
 
 
 async def _find_user_to_operate_on(email):
-    user_to_process = await user_collection.find_one({"email": email})
+    user_to_process = await user_collection.find_one(
+        {"email": email},
+        {"email": 1}
+    )
 
     if not user_to_process:
         raise HTTPException(
@@ -28,61 +63,30 @@ async def _find_user_to_operate_on(email):
     return user_to_process
 
 
-async def _update_for_block_on_user(user, user_to_block):
-    await user_collection.find_one_and_update(
-        {"_id": user.id},
-        [{"$set": {
-            "blockedUsers": {
-                "$cond": {
-                    "if": {
-                        "$not": {"$in": [user_to_block["_id"], "$blockedUsers"]}
-                    },
-                    "then": user.blocked_users + [user_to_block["_id"]],
-                    "else": "$blockedUsers"
-                }
-            },
-            "friendRequests": {
-                "$cond": {
-                    "if": {
-                        "$in": [user_to_block["email"], "$friendRequests.email"]
-                    },
-                    "then": _pop_and_return(
-                        user_to_block["email"],
-                        user.friend_requests
-                    ),
-                    "else": "$friendRequests"
-                }
-            },
-            "friends": {
-                "$cond": {
-                    "if": {
-                        "$in": [user_to_block["_id"], "$friends"]
-                    },
-                    "then": _pop_and_return(
-                        user_to_block["_id"],
-                        user.friends
-                    ),
-                    "else": "$friends"
-                }
-            }
-        }}]
-    )
+# Links before unlinks. Blocks are written ordered, so the BLOCKED edges
+# exist before any FRIEND or FRIEND_REQUEST edge is removed, and a
+# concurrent accept or send that re-checks for blocks after linking
+# either sees them or has its edge removed here.
+def _block_writes(owner_id, target_id):
+    return [
+        link(owner_id, RelationshipKind.BLOCKED, target_id),
+        unlink(owner_id, RelationshipKind.FRIEND, target_id),
+        unlink(owner_id, RelationshipKind.FRIEND_REQUEST, target_id)
+    ]
 
 
-async def add_user_to_block_list(user: User, request: OperationOnUserModel):
+async def add_user_to_block_list(
+    user: Principal,
+    request: OperationOnUserModel
+):
     user_to_block = await _find_user_to_operate_on(request.email)
 
-    if not user_to_block:
-        HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"User with email <{request.email} not found."
-        )
-
-    await _update_for_block_on_user(user, user_to_block)
-    await _update_for_block_on_user(
-        User(**user_to_block),
-        user.dict(by_alias=True)
+    await apply_relationship_writes(
+        _block_writes(user.id, user_to_block["_id"]) +
+        _block_writes(user_to_block["_id"], user.id),
+        ordered=True
     )
+    _invalidate_suggestions(user.id, user_to_block["_id"])
 
     response = {
         "blocked_user": request.email,
@@ -93,30 +97,51 @@ async def add_user_to_block_list(user: User, request: OperationOnUserModel):
     return response
 
 
-async def add_to_friend_requests_of_user(
-    user: User,
-    request: OperationOnUserModel
-):
-    user_to_send = User(**(await _find_user_to_operate_on(request.email)))
-
-    if user.id in user_to_send.blocked_users:
+def _refused_friend_request(email, existing: set):
+    if RelationshipKind.BLOCKED in existing:
         return {
             "friend_request_sent": False,
             "date_sent": date.today(),
-            "msg": f"User with email {request.email}"
+            "msg": f"User with email {email}"
                    f" has you blocked, no friend request was sent."
         }
 
-    if user.id in user_to_send.friends:
+    if RelationshipKind.FRIEND in existing:
         return {
             "friend_request_sent": False,
             "date_sent": date.today(),
-            "msg": f"User with email {request.email}"
+            "msg": f"User with email {email}"
                    f" already has you added."
         }
 
-    friend_request_emails = [req.email for req in user_to_send.friend_requests]
-    if user.email in friend_request_emails:
+    return None
+
+
+async def add_to_friend_requests_of_user(
+    user: Principal,
+    request: OperationOnUserModel
+):
+    user_to_send = await _find_user_to_operate_on(request.email)
+    target_id = user_to_send["_id"]
+
+    refused = _refused_friend_request(
+        request.email,
+        await relationship_kinds(
+            target_id,
+            user.id,
+            [RelationshipKind.BLOCKED, RelationshipKind.FRIEND]
+        )
+    )
+    if refused:
+        return refused
+
+    if not await add_relationship(
+        target_id,
+        RelationshipKind.FRIEND_REQUEST,
+        user.id,
+        targetEmail=user.email,
+        msg=request.msg
+    ):
         return {
             "friend_request_sent": False,
             "date_sent": date.today(),
@@ -124,21 +149,29 @@ async def add_to_friend_requests_of_user(
                    f" is pending previous friend request."
         }
 
-    await user_collection.find_one_and_update(
-        {"_id": user_to_send["_id"]},
-        [{"$set": {
-            "friendRequests": {
-                "$cond": {
-                    "if": {
-                        "$not": {"$in": [user.email, "$friendRequests.email"]}
-                    },
-                    "then": user_to_send["friendRequests"] +
-                    [{"email": user.email, "msg": request.msg}],
-                    "else": "$friendRequests"
-                }
-            }
-        }}]
+    # A block or friendship written between the check and the insert,
+    # withdraw the request this call created
+    refused = _refused_friend_request(
+        request.email,
+        await relationship_kinds(
+            target_id,
+            user.id,
+            [RelationshipKind.BLOCKED, RelationshipKind.FRIEND]
+        )
     )
+    if refused:
+        await remove_relationship(
+            target_id,
+            RelationshipKind.FRIEND_REQUEST,
+            user.id
+        )
+        return refused
+
+    _invalidate_suggestions(user.id, target_id)
+    await event_broker.publish(target_id, "friendRequest", {
+        "email": user.email,
+        "msg": request.msg
+    })
 
     response = {
         "friend_request_sent": True,
@@ -151,83 +184,376 @@ async def add_to_friend_requests_of_user(
 
 
 async def add_user_to_friends_list(
-    user: User,
+    user: Principal,
     request: OperationOnUserModel
 ):
     friend_to_add = await _find_user_to_operate_on(request.email)
+    friend_id = friend_to_add["_id"]
+
+    # Consuming the request first lets exactly one of several concurrent
+    # accepts go on to link the friendship
+    if not await remove_relationship(
+        user.id,
+        RelationshipKind.FRIEND_REQUEST,
+        friend_id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with email {request.email} "
+                   f"has not sent you a friend request."
+        )
 
-    if friend_to_add["_id"] in user.blocked_users:
-        return {
-            "msg": f"User with email {request.email} "
-                   f"is on your blocked list.",
-            "date_accepted": date.today()
-        }
-
-    for index, friend_request in enumerate(user.friend_requests):
-        if friend_request.email == request.email:
-            friend_info = user.friend_requests.pop(index)
-
-            friend_id = (await user_collection.find_one_and_update(
-                {"email": friend_info.email},
-                {"$push": {"friends": user.id}}
-            ))["_id"]
-
-            user.friends.append(friend_id)
-
-            await user_collection.find_one_and_update(
-                {"_id": user.id},
-                {
-                    "$set": {
-                        "friends": user.friends,
-                        "friendRequests": user.friend_requests
-                    }
-                }
-            )
-
-            return {
-                "msg": f"User with email {request.email} "
-                       f"has been added to your friends list.",
-                "date_accepted": date.today()
-            }
+    blocked = {
+        "msg": f"User with email {request.email} "
+               f"is on your blocked list.",
+        "date_accepted": date.today()
+    }
+    if await blocked_between(user.id, [friend_id]):
+        return blocked
+
+    friend_edges = [
+        (user.id, RelationshipKind.FRIEND, friend_id),
+        (friend_id, RelationshipKind.FRIEND, user.id)
+    ]
+    try:
+        await apply_relationship_writes([
+            link(*edge) for edge in friend_edges
+        ])
+    except PyMongoError:
+        # Either edge may have landed, leave neither behind
+        await apply_relationship_writes([
+            unlink(*edge) for edge in friend_edges
+        ])
+        raise
+
+    # A block written after the check above has already run its unlinks,
+    # remove the friendship it missed
+    if await blocked_between(user.id, [friend_id]):
+        await apply_relationship_writes([
+            unlink(*edge) for edge in friend_edges
+        ])
+        return blocked
+
+    _invalidate_suggestions(user.id, friend_id)
 
-    raise HTTPException(
-        status_code=status.HTTP_404_NOT_FOUND,
-        detail=f"User with email {request.email} "
-               f"has not sent you a friend request."
-    )
+    return {
+        "msg": f"User with email {request.email} "
+               f"has been added to your friends list.",
+        "date_accepted": date.today()
+    }
 
 
 async def remove_friend_from_list(
-    user: User,
+    user: Principal,
     request: OperationOnUserModel
 ):
-    friend_to_remove = User(**(await _find_user_to_operate_on(request.email)))
+    friend_to_remove = await _find_user_to_operate_on(request.email)
+    friend_id = friend_to_remove["_id"]
 
-    if friend_to_remove.id not in user.friends:
+    result = await apply_relationship_writes([
+        unlink(user.id, RelationshipKind.FRIEND, friend_id),
+        unlink(friend_id, RelationshipKind.FRIEND, user.id)
+    ])
+    _invalidate_suggestions(user.id, friend_id)
+
+    if not result.deleted_count:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with email <{request.email}> "
                    f"not found in friends list."
         )
 
-    user.friends.pop(user.friends.index(friend_to_remove.id))
-    friend_to_remove.friends.pop(friend_to_remove.friends.index(user.id))
+    return {
+        "msg": f"Friend {request.email} has been removed.",
+        "date_removed": date.today()
+    }
+
 
-    await user_collection.find_one_and_update(
-        {"_id": user.id},
-        {"$set": {"friends": user.friends}}
+async def show_all_friend_requests(
+    user: Principal,
+    limit: int,
+    after: Optional[PyObjectId] = None
+):
+    requests = await list_relationships(
+        user.id,
+        RelationshipKind.FRIEND_REQUEST,
+        limit=limit,
+        after=after,
+        projection={"targetEmail": 1, "msg": 1, "createdAt": 1}
     )
+    return [
+        {
+            "id": request["_id"],
+            "email": request["targetEmail"],
+            "msg": request.get("msg"),
+            "requested_at": request["createdAt"]
+        }
+        for request in requests
+    ]
 
-    await user_collection.find_one_and_update(
-        {"_id": friend_to_remove.id},
-        {"$set": {"friends": friend_to_remove.friends}}
+
+async def count_friend_requests(user: Principal):
+    count = await count_relationships(
+        user.id,
+        RelationshipKind.FRIEND_REQUEST
     )
+    return {"count": count}
 
-    return {
-        "msg": f"Friend {request.email} has been removed.",
-        "date_removed": date.today()
+
+def _plan_block(
+    edges: dict,
+    user: Principal,
+    target_id: PyObjectId,
+    item: BulkFriendOperationItem
+):
+    for owner_id, other_id in ((user.id, target_id), (target_id, user.id)):
+        edges.pop((owner_id, RelationshipKind.FRIEND, other_id), None)
+        edges.pop((owner_id, RelationshipKind.FRIEND_REQUEST, other_id), None)
+        edges[(owner_id, RelationshipKind.BLOCKED, other_id)] = {}
+
+    return True, f"User with email {item.email} has been blocked successfully"
+
+
+def _plan_send_friend_request(
+    edges: dict,
+    user: Principal,
+    target_id: PyObjectId,
+    item: BulkFriendOperationItem
+):
+    if (target_id, RelationshipKind.BLOCKED, user.id) in edges:
+        return False, f"User with email {item.email} has you blocked, " \
+                      f"no friend request was sent."
+    if (target_id, RelationshipKind.FRIEND, user.id) in edges:
+        return False, f"User with email {item.email} already has you added."
+    if (target_id, RelationshipKind.FRIEND_REQUEST, user.id) in edges:
+        return False, f"User with email {item.email} " \
+                      f"is pending previous friend request."
+
+    edges[(target_id, RelationshipKind.FRIEND_REQUEST, user.id)] = {
+        "targetEmail": user.email,
+        "msg": item.msg
     }
+    return True, f"User with email {item.email} " \
+                 f"has been sent a friend request."
+
+
+def _plan_accept_friend_request(
+    edges: dict,
+    user: Principal,
+    target_id: PyObjectId,
+    item: BulkFriendOperationItem
+):
+    if (user.id, RelationshipKind.BLOCKED, target_id) in edges:
+        return False, f"User with email {item.email} is on your blocked list."
+    if edges.pop(
+        (user.id, RelationshipKind.FRIEND_REQUEST, target_id),
+        None
+    ) is None:
+        return False, f"User with email {item.email} " \
+                      f"has not sent you a friend request."
+
+    edges[(user.id, RelationshipKind.FRIEND, target_id)] = {}
+    edges[(target_id, RelationshipKind.FRIEND, user.id)] = {}
+    return True, f"User with email {item.email} " \
+                 f"has been added to your friends list."
+
+
+def _plan_reject_friend_request(
+    edges: dict,
+    user: Principal,
+    target_id: PyObjectId,
+    item: BulkFriendOperationItem
+):
+    if edges.pop(
+        (user.id, RelationshipKind.FRIEND_REQUEST, target_id),
+        None
+    ) is None:
+        return False, f"User with email {item.email} " \
+                      f"has not sent you a friend request."
+
+    return True, f"Friend request from {item.email} has been rejected."
+
+
+def _plan_remove_friend(
+    edges: dict,
+    user: Principal,
+    target_id: PyObjectId,
+    item: BulkFriendOperationItem
+):
+    if edges.pop((user.id, RelationshipKind.FRIEND, target_id), None) is None:
+        return False, f"User with email <{item.email}> " \
+                      f"not found in friends list."
+
+    edges.pop((target_id, RelationshipKind.FRIEND, user.id), None)
+    return True, f"Friend {item.email} has been removed."
+
+
+FRIEND_OPERATION_PLANNERS = {
+    FriendOperation.BLOCK: _plan_block,
+    FriendOperation.SEND_FRIEND_REQUEST: _plan_send_friend_request,
+    FriendOperation.ACCEPT_FRIEND_REQUEST: _plan_accept_friend_request,
+    FriendOperation.REJECT_FRIEND_REQUEST: _plan_reject_friend_request,
+    FriendOperation.REMOVE_FRIEND: _plan_remove_friend
+}
+
+
+def _diff_writes(before: set, after: dict):
+    writes = [
+        link(owner_id, kind, target_id, **after[(owner_id, kind, target_id)])
+        for owner_id, kind, target_id in after.keys() - before
+    ]
+    writes += [
+        unlink(owner_id, kind, target_id)
+        for owner_id, kind, target_id in before - after.keys()
+    ]
+    return writes
+
+
+# Same re-check as the single accept and send paths. Friend and request
+# edges this batch created towards a user who blocked, or was blocked by,
+# the caller while the batch ran are removed again and their operations
+# reported as failed.
+async def _withdraw_blocked_links(
+    user: Principal,
+    before: set,
+    after: dict,
+    target_ids: dict,
+    results: list
+):
+    linked = [
+        (owner_id, kind, target_id)
+        for owner_id, kind, target_id in after.keys() - before
+        if kind != RelationshipKind.BLOCKED
+    ]
+    if not linked:
+        return
+
+    blocked = await blocked_between(user.id, list({
+        target_id if owner_id == user.id else owner_id
+        for owner_id, kind, target_id in linked
+    }))
+    if not blocked:
+        return
+
+    await apply_relationship_writes([
+        unlink(*edge) for edge in linked
+        if edge[0] in blocked or edge[2] in blocked
+    ])
+    for result in results:
+        if result["success"] and result["operation"] in (
+            FriendOperation.SEND_FRIEND_REQUEST,
+            FriendOperation.ACCEPT_FRIEND_REQUEST
+        ) and target_ids[result["email"]] in blocked:
+            result["success"] = False
+            result["msg"] = f"User with email {result['email']} " \
+                            f"has blocked or been blocked by you."
+
+
+async def apply_bulk_friend_operations(
+    user: Principal,
+    request: BulkFriendOperationsModel
+):
+    emails = list({item.email for item in request.operations})
+    targets = await user_collection.find(
+        {"email": {"$in": emails}},
+        {"email": 1}
+    ).to_list(length=None)
+    target_ids = {target["email"]: target["_id"] for target in targets}
+
+    # Operations are replayed in order against an in-memory copy of the
+    # affected edges, so only the net difference is written and no edge is
+    # changed twice. The diff is written ordered, links before unlinks, for
+    # the same reason as _block_writes.
+    before = await relationships_between(user.id, list(target_ids.values()))
+    edges = {edge: {} for edge in before}
+
+    results = []
+    for item in request.operations:
+        target_id = target_ids.get(item.email)
+        if target_id is None:
+            success, msg = False, f"User with email <{item.email}> not found."
+        else:
+            success, msg = FRIEND_OPERATION_PLANNERS[item.operation](
+                edges, user, target_id, item
+            )
+
+        results.append({
+            "email": item.email,
+            "operation": item.operation,
+            "success": success,
+            "msg": msg
+        })
+
+    writes = _diff_writes(before, edges)
+    if writes:
+        await apply_relationship_writes(writes, ordered=True)
+        _invalidate_suggestions(user.id, *target_ids.values())
+        await _withdraw_blocked_links(
+            user, before, edges, target_ids, results
+        )
+
+    for item, result in zip(request.operations, results):
+        if result["success"] and \
+                item.operation == FriendOperation.SEND_FRIEND_REQUEST:
+            await event_broker.publish(
+                target_ids[item.email],
+                "friendRequest",
+                {"email": user.email, "msg": item.msg}
+            )
+
+    return results
+
+
+async def _compute_friend_suggestions(user_id: PyObjectId):
+    (
+        friend_ids,
+        blocked_ids,
+        blocker_ids,
+        received_ids,
+        sent_ids
+    ) = await asyncio.gather(
+        relationship_target_ids(user_id, RelationshipKind.FRIEND),
+        relationship_target_ids(user_id, RelationshipKind.BLOCKED),
+        relationship_owner_ids(user_id, RelationshipKind.BLOCKED),
+        relationship_target_ids(user_id, RelationshipKind.FRIEND_REQUEST),
+        relationship_owner_ids(user_id, RelationshipKind.FRIEND_REQUEST)
+    )
+    if not friend_ids:
+        return []
+
+    candidates = await mutual_friend_counts(
+        friend_ids,
+        [
+            user_id,
+            *friend_ids,
+            *blocked_ids,
+            *blocker_ids,
+            *received_ids,
+            *sent_ids
+        ],
+        settings.FRIEND_SUGGESTIONS_LIMIT
+    )
+    candidate_users = await user_collection.find(
+        {"_id": {"$in": [candidate["_id"] for candidate in candidates]}},
+        {"email": 1}
+    ).to_list(length=None)
+    emails = {user["_id"]: user["email"] for user in candidate_users}
+
+    return [
+        {
+            "id": candidate["_id"],
+            "email": emails[candidate["_id"]],
+            "mutual_friends": candidate["mutualFriends"]
+        }
+        for candidate in candidates
+        if candidate["_id"] in emails
+    ]
+
 
+async def get_friend_suggestions(user: Principal, limit: int):
+    suggestions = suggestions_cache.get(user.id)
+    if suggestions is None:
+        suggestions = await _compute_friend_suggestions(user.id)
+        suggestions_cache.set(user.id, suggestions)
 
-async def show_all_friend_requests(user: User):
-    return user.friend_requests
+    return suggestions[:limit]
@@ -0,0 +1,207 @@
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne, DeleteOne
+
+from app.db.model_utils import PyObjectId
+from app.db.mongo_driver import relationships_collection
+
+from app.api.friends.friends_models import RelationshipKind
+
+# Social graph stored as one document per (owner, kind, target) edge. The
+# unique edge index makes every membership check a single index lookup no
+# matter how many friends, blocks or requests a user has.
+
+
+def link(
+    owner_id: PyObjectId,
+    kind: RelationshipKind,
+    target_id: PyObjectId,
+    **fields
+):
+    return UpdateOne(
+        {"ownerId": owner_id, "kind": kind.value, "targetId": target_id},
+        {"$setOnInsert": {
+            "_id": ObjectId(),
+            "createdAt": datetime.utcnow(),
+            **fields
+        }},
+        upsert=True
+    )
+
+
+def unlink(
+    owner_id: PyObjectId,
+    kind: RelationshipKind,
+    target_id: PyObjectId
+):
+    return DeleteOne(
+        {"ownerId": owner_id, "kind": kind.value, "targetId": target_id}
+    )
+
+
+async def apply_relationship_writes(writes: list, ordered: bool = False):
+    return await relationships_collection.bulk_write(writes, ordered=ordered)
+
+
+# True when this call created the edge, False when it already existed
+async def add_relationship(
+    owner_id: PyObjectId,
+    kind: RelationshipKind,
+    target_id: PyObjectId,
+    **fields
+):
+    result = await apply_relationship_writes(
+        [link(owner_id, kind, target_id, **fields)]
+    )
+    return result.upserted_count > 0
+
+
+# True when this call removed the edge, so concurrent callers removing the
+# same edge see it succeed exactly once
+async def remove_relationship(
+    owner_id: PyObjectId,
+    kind: RelationshipKind,
+    target_id: PyObjectId
+):
+    result = await relationships_collection.delete_one(
+        {"ownerId": owner_id, "kind": kind.value, "targetId": target_id}
+    )
+    return result.deleted_count > 0
+
+
+async def has_relationship(
+    owner_id: PyObjectId,
+    kind: RelationshipKind,
+    target_id: PyObjectId
+):
+    edge = await relationships_collection.find_one(
+        {"ownerId": owner_id, "kind": kind.value, "targetId": target_id},
+        {"_id": 1}
+    )
+    return edge is not None
+
+
+async def relationship_kinds(
+    owner_id: PyObjectId,
+    target_id: PyObjectId,
+    kinds: Iterable[RelationshipKind]
+):
+    edges = await relationships_collection.find(
+        {
+            "ownerId": owner_id,
+            "kind": {"$in": [kind.value for kind in kinds]},
+            "targetId": target_id
+        },
+        {"kind": 1}
+    ).to_list(length=None)
+
+    return {RelationshipKind(edge["kind"]) for edge in edges}
+
+
+# Targets out of target_ids with a BLOCKED edge to or from the owner
+async def blocked_between(owner_id: PyObjectId, target_ids: List[PyObjectId]):
+    edges = await relationships_collection.find(
+        {"kind": RelationshipKind.BLOCKED.value, "$or": [
+            {"ownerId": owner_id, "targetId": {"$in": target_ids}},
+            {"ownerId": {"$in": target_ids}, "targetId": owner_id}
+        ]},
+        {"ownerId": 1, "targetId": 1}
+    ).to_list(length=None)
+
+    return {
+        edge["targetId"] if edge["ownerId"] == owner_id else edge["ownerId"]
+        for edge in edges
+    }
+
+
+# Every edge between the owner and the targets in either direction, as
+# (ownerId, kind, targetId) tuples
+async def relationships_between(
+    owner_id: PyObjectId,
+    target_ids: List[PyObjectId]
+):
+    edges = await relationships_collection.find(
+        {"$or": [
+            {"ownerId": owner_id, "targetId": {"$in": target_ids}},
+            {"ownerId": {"$in": target_ids}, "targetId": owner_id}
+        ]},
+        {"ownerId": 1, "kind": 1, "targetId": 1}
+    ).to_list(length=None)
+
+    return {
+        (edge["ownerId"], RelationshipKind(edge["kind"]), edge["targetId"])
+        for edge in edges
+    }
+
+
+async def list_relationships(
+    owner_id: PyObjectId,
+    kind: RelationshipKind,
+    limit: Optional[int] = None,
+    after: Optional[PyObjectId] = None,
+    projection: Optional[dict] = None
+):
+    # Edge ids are ObjectIds, so _id order is creation order and doubles as
+    # a keyset cursor served by the relationship_listing index
+    query = {"ownerId": owner_id, "kind": kind.value}
+    if after:
+        query["_id"] = {"$gt": after}
+
+    cursor = relationships_collection.find(query, projection).sort("_id", 1)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    return await cursor.to_list(length=None)
+
+
+async def count_relationships(
+    owner_id: PyObjectId,
+    kind: RelationshipKind
+):
+    return await relationships_collection.count_documents(
+        {"ownerId": owner_id, "kind": kind.value}
+    )
+
+
+async def mutual_friend_counts(
+    friend_ids: List[PyObjectId],
+    excluded_ids: List[PyObjectId],
+    limit: int
+):
+    # Friends of friends grouped by how many of the given friends they share
+    return await relationships_collection.aggregate([
+        {"$match": {
+            "ownerId": {"$in": friend_ids},
+            "kind": RelationshipKind.FRIEND.value,
+            "targetId": {"$nin": excluded_ids}
+        }},
+        {"$group": {"_id": "$targetId", "mutualFriends": {"$sum": 1}}},
+        {"$sort": {"mutualFriends": -1, "_id": 1}},
+        {"$limit": limit}
+    ]).to_list(length=None)
+
+
+async def relationship_target_ids(
+    owner_id: PyObjectId,
+    kind: RelationshipKind
+) -> List[PyObjectId]:
+    edges = await relationships_collection.find(
+        {"ownerId": owner_id, "kind": kind.value},
+        {"targetId": 1, "_id": 0}
+    ).to_list(length=None)
+
+    return [edge["targetId"] for edge in edges]
+
+
+async def relationship_owner_ids(
+    target_id: PyObjectId,
+    kind: RelationshipKind
+) -> List[PyObjectId]:
+    edges = await relationships_collection.find(
+        {"targetId": target_id, "kind": kind.value},
+        {"ownerId": 1, "_id": 0}
+    ).to_list(length=None)
+
+    return [edge["ownerId"] for edge in edges]
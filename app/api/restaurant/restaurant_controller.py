@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from fastapi import APIRouter, Path, Query, Depends
 
@@ -6,6 +6,7 @@ from app.db.model_utils import PyObjectId
 
 from app.api.restaurant.restaurant_models import (
     RestaurantModel,
+    DiscoveredRestaurantModel,
     RestaurantUpdateModel,
     PriceRating,
     RestaurantCategory,
@@ -19,9 +20,10 @@ from app.api.restaurant.restaurant_service import (
     remove_restaurant,
     update_restaurant_info,
     query_match_restaurants,
+    get_discovery_cache_stats
 )
 
-from app.lib.auth.auth_models import User, Roles
+from app.lib.auth.auth_models import Principal, Roles
 from app.lib.auth.auth_service import get_user_with_roles
 
 restaurant_router = APIRouter()
@@ -29,7 +31,7 @@ restaurant_router = APIRouter()
 
 @restaurant_router.get("", response_model=List[RestaurantModel])
 async def retrieve_all_restaurants(
-    user: User = Depends(get_user_with_roles([
+    user: Principal = Depends(get_user_with_roles([
         Roles.BASE_USER
     ]))
 ):
@@ -38,10 +40,10 @@ async def retrieve_all_restaurants(
 
 @restaurant_router.get(
     "/discover-restaurants",
-    response_model=List[RestaurantModel]
+    response_model=List[DiscoveredRestaurantModel]
 )
 async def discover_restaurants(
-    user: User = Depends(get_user_with_roles([
+    user: Principal = Depends(get_user_with_roles([
         Roles.BASE_USER
     ])),
     minimum_price_rating: Optional[PriceRating] = Query(
@@ -67,7 +69,8 @@ async def discover_restaurants(
         FoodCategory.fields(),
         alias="providesFoodCategories"
     ),
-    max_to_display: Optional[int] = Query(3, gt=0, alias="maxToDisplay")
+    max_to_display: Optional[int] = Query(3, gt=0, alias="maxToDisplay"),
+    ranked: Optional[bool] = Query(False)
 ):
     return await query_match_restaurants(
         minimum_price_rating,
@@ -81,17 +84,30 @@ async def discover_restaurants(
         includes_vegan_options,
         provides_food_categories,
         max_spend,
-        max_to_display
+        max_to_display,
+        ranked
     )
 
 
+@restaurant_router.get(
+    "/discovery-cache-stats",
+    response_model=Dict[str, int]
+)
+async def retrieve_discovery_cache_stats(
+    user: Principal = Depends(get_user_with_roles([
+        Roles.ADMIN
+    ]))
+):
+    return get_discovery_cache_stats()
+
+
 @restaurant_router.get(
     "/{restaurantId}",
     response_model=RestaurantModel
 )
 async def retrieve_restaurant(
     restaurant_id: PyObjectId = Path(..., alias="restaurantId"),
-    user: User = Depends(get_user_with_roles([
+    user: Principal = Depends(get_user_with_roles([
         Roles.BASE_USER
     ]))
 ):
@@ -101,7 +117,7 @@ async def retrieve_restaurant(
 @restaurant_router.post("", response_model=RestaurantModel)
 async def create_restaurant(
     request: RestaurantModel,
-    user: User = Depends(get_user_with_roles([
+    user: Principal = Depends(get_user_with_roles([
         Roles.ADMIN
     ]))
 ):
@@ -114,7 +130,7 @@ async def create_restaurant(
 )
 async def delete_restaurant(
     restaurant_id: PyObjectId = Path(..., alias="restaurantId"),
-    user: User = Depends(get_user_with_roles([
+    user: Principal = Depends(get_user_with_roles([
         Roles.ADMIN
     ]))
 ):
@@ -125,7 +141,7 @@ async def delete_restaurant(
 async def update_restaurant(
     request: RestaurantUpdateModel,
     restaurant_id: PyObjectId = Path(..., alias="restaurantId"),
-    user: User = Depends(get_user_with_roles([
+    user: Principal = Depends(get_user_with_roles([
         Roles.ADMIN
     ]))
 ):
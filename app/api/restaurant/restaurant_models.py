@@ -143,6 +143,32 @@ class RestaurantModel(CustomModel):
         }
 
 
+# The few restaurant fields copied onto documents that reference a
+# restaurant, enough to render them without loading the restaurant itself.
+class RestaurantSnapshotModel(CustomModel):
+    name: str = Field(...)
+    city: str = Field(...)
+    price_rating: PriceRating = Field(...)
+    lat: float = Field(..., ge=-90, le=90)
+    long: float = Field(..., ge=-180, le=180)
+
+
+class DiscoveredRestaurantModel(RestaurantModel):
+    distance_km: Optional[float] = Field(default=None, alias="distanceKm")
+    score: Optional[float] = Field(default=None)
+
+
+class RestaurantDiscoveryFilters(CustomModel):
+    minimum_price_rating: PriceRating = Field(...)
+    restaurant_categories: List[RestaurantCategory] = Field(...)
+    has_open_table: bool = Field(...)
+    minimum_rating: float = Field(...)
+    minimum_reviews: int = Field(...)
+    includes_vegan_options: bool = Field(...)
+    provides_food_categories: List[FoodCategory] = Field(...)
+    max_spend: int = Field(...)
+
+
 class RestaurantUpdateModel(CustomModel):
     name: Optional[str] = Field(default=None)
     city: Optional[str] = Field(default=None)
@@ -0,0 +1,57 @@
+from heapq import heappush, heapreplace
+from math import log1p
+
+from app.settings import settings
+
+
+def _review_count_score(review_count: int):
+    cap = settings.DISCOVERY_RANK_REVIEW_COUNT_CAP
+    return min(log1p(review_count) / log1p(cap), 1)
+
+
+# Bounded min-heap of the best k restaurants seen so far. Candidates must be
+# offered nearest first: the distance term only ever shrinks, so once the
+# worst kept score beats the best score any farther restaurant could reach,
+# the top k is final and the caller can stop reading.
+class TopKRanker:
+    def __init__(self, k: int, radius: float):
+        self.k = k
+        self.radius = radius
+        self._heap = []
+
+    def score(self, restaurant: dict):
+        distance_score = 1 - restaurant["distanceKm"] / self.radius
+        rating_score = restaurant["reviewRating"] / 5
+        count_score = _review_count_score(restaurant["reviewCount"])
+
+        return settings.DISCOVERY_RANK_DISTANCE_WEIGHT * distance_score + \
+            settings.DISCOVERY_RANK_RATING_WEIGHT * rating_score + \
+            settings.DISCOVERY_RANK_REVIEW_COUNT_WEIGHT * count_score
+
+    def _best_possible_score(self, distance: float):
+        return settings.DISCOVERY_RANK_DISTANCE_WEIGHT * \
+            (1 - distance / self.radius) + \
+            settings.DISCOVERY_RANK_RATING_WEIGHT + \
+            settings.DISCOVERY_RANK_REVIEW_COUNT_WEIGHT
+
+    def is_settled(self, distance: float):
+        return len(self._heap) == self.k and \
+            self._heap[0][0] > self._best_possible_score(distance)
+
+    def offer(self, restaurant: dict):
+        score = self.score(restaurant)
+        entry = (
+            score,
+            -restaurant["distanceKm"],
+            str(restaurant["_id"]),
+            {**restaurant, "score": score}
+        )
+
+        if len(self._heap) < self.k:
+            heappush(self._heap, entry)
+        elif entry[:3] > self._heap[0][:3]:
+            heapreplace(self._heap, entry)
+
+    def results(self):
+        ranked = sorted(self._heap, key=lambda entry: entry[:3], reverse=True)
+        return [entry[3] for entry in ranked]
@@ -1,4 +1,5 @@
-from typing import List
+from math import floor, ceil, radians, sqrt
+from typing import List, Optional
 
 from fastapi import HTTPException, status
 
@@ -7,10 +8,12 @@ from bson import ObjectId
 
 from app.db.mongo_driver import restaurant_collection
 from app.db.model_utils import PyObjectId
+from app.settings import settings
 
 from app.api.restaurant.restaurant_models import (
     RestaurantModel,
     RestaurantUpdateModel,
+    RestaurantDiscoveryFilters,
     PriceRating,
     RestaurantCategory,
     FoodCategory
@@ -18,8 +21,160 @@ from app.api.restaurant.restaurant_models import (
 
 from app.lib.misc.general import (
     pop_from_dict,
-    within_radius
+    within_radius,
+    within_radius_batch,
+    EARTH_RADIUS_KM
 )
+from app.lib.misc.spatial_grid import SpatialGrid
+from app.lib.misc.cache import TTLCache
+
+from app.api.restaurant.restaurant_ranking import TopKRanker
+
+# Aggregation expression rebuilding the GeoJSON point from a document's own
+# lat/long, used by pipeline updates and the location migration.
+LOCATION_FROM_COORDINATES = {
+    "type": "Point",
+    "coordinates": ["$long", "$lat"]
+}
+
+# Fields derived from a restaurant's own data so discovery can filter on
+# plain indexable values, see _derived_restaurant_fields for the same logic
+# in Python.
+DERIVED_RESTAURANT_FIELDS = {
+    "location": LOCATION_FROM_COORDINATES,
+    "reviewCount": {"$size": {"$ifNull": ["$reviews", []]}},
+    "minMenuPrice": {"$min": "$topMenuItems.price"},
+    "hasVeganItem": {
+        "$in": [True, {"$ifNull": ["$topMenuItems.isVegan", []]}]
+    },
+    "foodCategories": {
+        "$setUnion": [{"$ifNull": ["$topMenuItems.foodCategory", []]}, []]
+    }
+}
+
+
+RESTAURANT_SNAPSHOT_PROJECTION = {
+    "_id": 0,
+    "name": 1,
+    "city": 1,
+    "priceRating": 1,
+    "lat": 1,
+    "long": 1
+}
+
+
+def _to_geo_point(lat: float, long: float):
+    return {"type": "Point", "coordinates": [long, lat]}
+
+
+def _derived_restaurant_fields(restaurant: dict):
+    menu_items = restaurant.get("topMenuItems") or []
+    prices = [item["price"] for item in menu_items]
+
+    return {
+        "location": _to_geo_point(restaurant["lat"], restaurant["long"]),
+        "reviewCount": len(restaurant.get("reviews") or []),
+        "minMenuPrice": min(prices) if prices else None,
+        "hasVeganItem": any(item["isVegan"] is True for item in menu_items),
+        "foodCategories": sorted(
+            {item["foodCategory"] for item in menu_items}
+        )
+    }
+
+
+# Only populated when DISCOVERY_MODE is "memory".
+restaurant_index = SpatialGrid(settings.DISCOVERY_GRID_CELL_DEGREES)
+
+
+def _index_restaurant(restaurant: dict):
+    if settings.DISCOVERY_MODE == "memory":
+        restaurant_index.upsert(
+            restaurant["_id"],
+            restaurant["lat"],
+            restaurant["long"],
+            restaurant
+        )
+
+
+def _unindex_restaurant(restaurant_id: PyObjectId):
+    if settings.DISCOVERY_MODE == "memory":
+        restaurant_index.remove(restaurant_id)
+
+
+discovery_cache = TTLCache(
+    settings.DISCOVERY_CACHE_MAX_ENTRIES,
+    settings.DISCOVERY_CACHE_TTL_SECONDS
+)
+
+# Bumped by every invalidation. A miss that saw it change while scanning
+# may hold restaurants from before the write and is not stored.
+_discovery_cache_generation = 0
+
+
+def _discovery_cache_key(
+    filters: RestaurantDiscoveryFilters,
+    lat: float,
+    long: float,
+    radius: float
+):
+    grid = settings.DISCOVERY_CACHE_GRID_DEGREES
+    bucket = settings.DISCOVERY_CACHE_RADIUS_BUCKET_KM
+
+    return (
+        floor(lat / grid),
+        floor(long / grid),
+        ceil(radius / bucket),
+        filters.minimum_price_rating,
+        tuple(sorted(set(filters.restaurant_categories))),
+        filters.has_open_table,
+        filters.minimum_rating,
+        filters.minimum_reviews,
+        filters.includes_vegan_options,
+        tuple(sorted(set(filters.provides_food_categories))),
+        filters.max_spend
+    )
+
+
+# Center and radius of the area an entry holds: every restaurant within the
+# bucketed radius of any point in the cell. The cell's half diagonal is at
+# most half the grid size in degrees along each axis, one degree being at
+# most EARTH_RADIUS_KM * pi / 180 km.
+def _discovery_cache_region(key: tuple):
+    grid = settings.DISCOVERY_CACHE_GRID_DEGREES
+    lat_cell, long_cell, radius_buckets = key[:3]
+
+    lat = min(max((lat_cell + 0.5) * grid, -90), 90)
+    long = min(max((long_cell + 0.5) * grid, -180), 180)
+    half_diagonal = sqrt(2) * EARTH_RADIUS_KM * radians(grid / 2)
+    radius = radius_buckets * settings.DISCOVERY_CACHE_RADIUS_BUCKET_KM + \
+        half_diagonal
+    return lat, long, radius
+
+
+def _invalidate_discovery_cache(*restaurants: Optional[dict]):
+    global _discovery_cache_generation
+    _discovery_cache_generation += 1
+
+    locations = [(r["lat"], r["long"]) for r in restaurants if r]
+
+    def affected(key: tuple):
+        lat, long, radius = _discovery_cache_region(key)
+        return any(
+            within_radius(lat, long, p_lat, p_long, radius)
+            for p_lat, p_long in locations
+        )
+
+    discovery_cache.invalidate_where(affected)
+
+
+async def load_restaurant_index():
+    if settings.DISCOVERY_MODE != "memory":
+        return
+
+    restaurants = await restaurant_collection.find().to_list(length=None)
+    restaurant_index.rebuild(
+        (r["_id"], r["lat"], r["long"], r) for r in restaurants
+    )
 
 
 async def get_all_restaurants():
@@ -39,6 +194,20 @@ async def get_restaurant(restaurant_id: PyObjectId):
     )
 
 
+async def get_restaurant_snapshot(restaurant_id: PyObjectId):
+    return await restaurant_collection.find_one(
+        {"_id": restaurant_id},
+        RESTAURANT_SNAPSHOT_PROJECTION
+    )
+
+
+async def get_restaurants_by_ids(restaurant_ids: List[PyObjectId]):
+    restaurants = await restaurant_collection.find(
+        {"_id": {"$in": restaurant_ids}}
+    ).to_list(length=None)
+    return {restaurant["_id"]: restaurant for restaurant in restaurants}
+
+
 async def add_restaurant(request: RestaurantModel):
     request.id = ObjectId()
 
@@ -48,13 +217,14 @@ async def add_restaurant(request: RestaurantModel):
     for menu_item in request.top_menu_items:
         menu_item.id = ObjectId()
 
-    new_restaurant = await restaurant_collection.insert_one(
-        request.dict(by_alias=True)
-    )
-    created_restaurant = await restaurant_collection.find_one(
-        {"_id": new_restaurant.inserted_id}
-    )
-    return created_restaurant
+    restaurant = request.dict(by_alias=True)
+    restaurant.update(_derived_restaurant_fields(restaurant))
+
+    # The inserted document is exactly what we built, no need to read it back
+    await restaurant_collection.insert_one(restaurant)
+    _index_restaurant(restaurant)
+    _invalidate_discovery_cache(restaurant)
+    return restaurant
 
 
 async def remove_restaurant(restaurant_id: PyObjectId):
@@ -63,6 +233,8 @@ async def remove_restaurant(restaurant_id: PyObjectId):
     )
 
     if restaurant_to_delete:
+        _unindex_restaurant(restaurant_id)
+        _invalidate_discovery_cache(restaurant_to_delete)
         return restaurant_to_delete
 
     raise HTTPException(
@@ -92,7 +264,7 @@ async def update_restaurant_info(
     pop_from_dict(fields_to_update, "reviews_to_remove")
     pop_from_dict(fields_to_update, "top_menu_items_to_remove")
 
-    await restaurant_collection.find_one_and_update(
+    previous_restaurant = await restaurant_collection.find_one_and_update(
         {"_id": restaurant_id},
         {
             "$set": fields_to_update,
@@ -101,20 +273,29 @@ async def update_restaurant_info(
                 "topMenuItems": {"_id": {"$in": menu_items_to_remove}}
             }
         },
-        return_document=ReturnDocument.AFTER
+        return_document=ReturnDocument.BEFORE
     )
 
-    reviews_to_add = [r.dict() for r in reviews_to_add]
-    menu_items_to_add = [m.dict() for m in menu_items_to_add]
+    reviews_to_add = [r.dict(by_alias=True) for r in reviews_to_add]
+    menu_items_to_add = [m.dict(by_alias=True) for m in menu_items_to_add]
 
+    # Appending through a pipeline lets the derived fields be recomputed
+    # from the final arrays in the same write.
     restaurant_to_update = await restaurant_collection.find_one_and_update(
         {"_id": restaurant_id},
-        {
-            "$push": {
-                "reviews": {"$each": reviews_to_add},
-                "topMenuItems": {"$each": menu_items_to_add}
-            }
-        },
+        [
+            {"$set": {
+                "reviews": {"$concatArrays": [
+                    {"$ifNull": ["$reviews", []]},
+                    {"$literal": reviews_to_add}
+                ]},
+                "topMenuItems": {"$concatArrays": [
+                    {"$ifNull": ["$topMenuItems", []]},
+                    {"$literal": menu_items_to_add}
+                ]}
+            }},
+            {"$set": DERIVED_RESTAURANT_FIELDS}
+        ],
         return_document=ReturnDocument.AFTER
     )
 
@@ -124,9 +305,216 @@ async def update_restaurant_info(
             detail=f"Restaurant with id <{restaurant_id}> not found."
         )
 
+    _index_restaurant(restaurant_to_update)
+    _invalidate_discovery_cache(previous_restaurant, restaurant_to_update)
     return restaurant_to_update
 
 
+def _build_discovery_query(filters: RestaurantDiscoveryFilters):
+    query = {
+        "reviewCount": {"$gte": filters.minimum_reviews},
+        "reviewRating": {"$gte": filters.minimum_rating},
+        "restaurantCategory": {"$in": filters.restaurant_categories},
+        "priceRating": {"$gte": filters.minimum_price_rating},
+        "minMenuPrice": {"$lte": filters.max_spend}
+    }
+
+    if filters.has_open_table:
+        query["openTableUrl"] = {"$ne": None}
+
+    if filters.includes_vegan_options:
+        query["hasVeganItem"] = True
+
+    if filters.provides_food_categories:
+        query["foodCategories"] = {"$in": filters.provides_food_categories}
+
+    return query
+
+
+# In-memory twin of _build_discovery_query, both must be kept in sync so the
+# mongo and memory discovery modes return identical results.
+def _matches_discovery_filters(
+    restaurant: dict,
+    filters: RestaurantDiscoveryFilters
+):
+    if restaurant["reviewCount"] < filters.minimum_reviews:
+        return False
+    if restaurant["reviewRating"] < filters.minimum_rating:
+        return False
+    if restaurant["restaurantCategory"] not in filters.restaurant_categories:
+        return False
+    if restaurant["priceRating"] < filters.minimum_price_rating:
+        return False
+    if restaurant["minMenuPrice"] is None or \
+            restaurant["minMenuPrice"] > filters.max_spend:
+        return False
+    if filters.has_open_table and restaurant.get("openTableUrl") is None:
+        return False
+    if filters.includes_vegan_options and not restaurant["hasVeganItem"]:
+        return False
+    if filters.provides_food_categories and not any(
+        category in filters.provides_food_categories
+        for category in restaurant["foodCategories"]
+    ):
+        return False
+
+    return True
+
+
+async def _discovery_candidates(
+    filters: RestaurantDiscoveryFilters,
+    lat: float,
+    long: float,
+    radius: float,
+    limit: Optional[int] = None
+):
+    if settings.DISCOVERY_MODE == "memory":
+        for distance, restaurant in restaurant_index.nearby(lat, long, radius):
+            if _matches_discovery_filters(restaurant, filters):
+                yield {**restaurant, "distanceKm": distance}
+        return
+
+    # Distances are computed on a sphere of EARTH_RADIUS_KM so the radius
+    # matches the haversine used elsewhere; a legacy coordinate pair as
+    # "near" makes $geoNear work in radians, which we scale back to km.
+    pipeline = [
+        {"$geoNear": {
+            "near": [long, lat],
+            "spherical": True,
+            "key": "location",
+            "query": _build_discovery_query(filters),
+            "maxDistance": radius / EARTH_RADIUS_KM,
+            "distanceMultiplier": EARTH_RADIUS_KM,
+            "distanceField": "distanceKm"
+        }}
+    ]
+    if limit:
+        pipeline.append({"$limit": limit})
+
+    cursor = restaurant_collection.aggregate(
+        pipeline,
+        batchSize=settings.DISCOVERY_BATCH_SIZE
+    )
+    try:
+        async for restaurant in cursor:
+            yield restaurant
+    finally:
+        await cursor.close()
+
+
+async def _query_match_restaurants(
+    filters: RestaurantDiscoveryFilters,
+    lat: float,
+    long: float,
+    radius: float,
+    max_to_display: int,
+    ranked: bool
+):
+    if ranked:
+        ranker = TopKRanker(max_to_display, radius)
+        candidates = _discovery_candidates(filters, lat, long, radius)
+        try:
+            async for restaurant in candidates:
+                if ranker.is_settled(restaurant["distanceKm"]):
+                    break
+                ranker.offer(restaurant)
+        finally:
+            await candidates.aclose()
+
+        return ranker.results()
+
+    restaurants = []
+    candidates = _discovery_candidates(
+        filters,
+        lat,
+        long,
+        radius,
+        limit=max_to_display
+    )
+    try:
+        async for restaurant in candidates:
+            restaurants.append(restaurant)
+            if len(restaurants) == max_to_display:
+                break
+    finally:
+        await candidates.aclose()
+
+    return restaurants
+
+
+def _select_cached_restaurants(
+    restaurants: List[dict],
+    lat: float,
+    long: float,
+    radius: float,
+    max_to_display: int,
+    ranked: bool
+):
+    if not restaurants:
+        return []
+
+    inside, distances = within_radius_batch(
+        lat,
+        long,
+        [restaurant["lat"] for restaurant in restaurants],
+        [restaurant["long"] for restaurant in restaurants],
+        radius
+    )
+    nearby = sorted(
+        (
+            {**restaurant, "distanceKm": float(distance)}
+            for restaurant, distance, is_inside
+            in zip(restaurants, distances, inside)
+            if is_inside
+        ),
+        key=lambda restaurant: (
+            restaurant["distanceKm"],
+            str(restaurant["_id"])
+        )
+    )
+
+    if not ranked:
+        return nearby[:max_to_display]
+
+    ranker = TopKRanker(max_to_display, radius)
+    for restaurant in nearby:
+        if ranker.is_settled(restaurant["distanceKm"]):
+            break
+        ranker.offer(restaurant)
+    return ranker.results()
+
+
+# The entry holds every match around the cell so it serves any caller
+# sharing the key, each caller's own origin and radius are applied on
+# read. Returns None when the area holds more matches than an entry may.
+async def _fill_discovery_cache(
+    key: tuple,
+    filters: RestaurantDiscoveryFilters
+):
+    generation = _discovery_cache_generation
+    cell_lat, cell_long, cell_radius = _discovery_cache_region(key)
+    restaurants = []
+    candidates = _discovery_candidates(
+        filters,
+        cell_lat,
+        cell_long,
+        cell_radius,
+        settings.DISCOVERY_CACHE_MAX_ENTRY_SIZE + 1
+    )
+    try:
+        async for restaurant in candidates:
+            restaurants.append(restaurant)
+    finally:
+        await candidates.aclose()
+
+    if len(restaurants) > settings.DISCOVERY_CACHE_MAX_ENTRY_SIZE:
+        return None
+
+    if generation == _discovery_cache_generation:
+        discovery_cache.set(key, restaurants)
+    return restaurants
+
+
 async def query_match_restaurants(
     minimum_price_rating: PriceRating,
     restaurant_categories: List[RestaurantCategory],
@@ -139,57 +527,56 @@ async def query_match_restaurants(
     includes_vegan_options: bool,
     provides_food_categories: List[FoodCategory],
     max_spend: int,
-    max_to_display: int
+    max_to_display: int,
+    ranked: bool = False
 ):
-    query = {
-        "$expr": {"$gte": [{"$size": "$reviews"}, minimum_reviews]},
-        "reviewRating": {"$gte": minimum_rating},
-        "restaurantCategory": {"$in": restaurant_categories},
-        "priceRating": {"$gte": minimum_price_rating},
-        "$and": []
-    }
+    filters = RestaurantDiscoveryFilters(
+        minimum_price_rating=minimum_price_rating,
+        restaurant_categories=restaurant_categories,
+        has_open_table=has_open_table,
+        minimum_rating=minimum_rating,
+        minimum_reviews=minimum_reviews,
+        includes_vegan_options=includes_vegan_options,
+        provides_food_categories=provides_food_categories,
+        max_spend=max_spend
+    )
 
-    if has_open_table:
-        query["$and"].append({"openTableUrl": {"$ne": None}})
-
-    if includes_vegan_options or provides_food_categories:
-        if includes_vegan_options:
-            vegan_filter = {"topMenuItems": {"$elemMatch": {"isVegan": True}}}
-            query["$and"].append(vegan_filter)
-        if provides_food_categories:
-            food_filter = {
-                "topMenuItems": {
-                    "$elemMatch": {
-                        "foodCategory": {
-                            "$in": provides_food_categories
-                        }
-                    }
-                }
-            }
-            query["$and"].append(food_filter)
-
-    query["$and"].append({
-        "topMenuItems": {
-            "$elemMatch": {
-                "price": {
-                    "$lte": max_spend
-                }
-            }
-        }
-    })
+    if not settings.DISCOVERY_CACHE_ENABLED or \
+            radius > settings.DISCOVERY_CACHE_MAX_RADIUS_KM:
+        return await _query_match_restaurants(
+            filters,
+            lat,
+            long,
+            radius,
+            max_to_display,
+            ranked
+        )
 
-    restaurants = await restaurant_collection.find(query).to_list(length=None)
+    key = _discovery_cache_key(filters, lat, long, radius)
+    restaurants = discovery_cache.get(key)
 
-    valid_restaurants = []
+    if restaurants is None:
+        restaurants = await _fill_discovery_cache(key, filters)
 
-    for restaurant in restaurants:
-        if within_radius(
+    if restaurants is None:
+        return await _query_match_restaurants(
+            filters,
             lat,
             long,
-            restaurant["lat"],
-            restaurant["long"],
-            radius
-        ):
-            valid_restaurants.append(restaurant)
+            radius,
+            max_to_display,
+            ranked
+        )
+
+    return _select_cached_restaurants(
+        restaurants,
+        lat,
+        long,
+        radius,
+        max_to_display,
+        ranked
+    )
+
 
-    return valid_restaurants[:max_to_display]
+def get_discovery_cache_stats():
+    return discovery_cache.stats()
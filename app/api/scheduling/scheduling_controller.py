@@ -3,11 +3,11 @@ from typing import List, Optional
 from fastapi import APIRouter, Depends, Path, Query
 
 from app.api.scheduling.scheduling_models import (
-    ScheduledDateModel
+    HydratedScheduledDateModel
 )
-from app.db.model_utils import PyObjectId
+from app.db.model_utils import PyObjectId, DateTime
 from app.lib.auth.auth_models import (
-    User,
+    Principal,
     Roles
 )
 from app.lib.auth.auth_service import get_user_with_roles
@@ -15,11 +15,13 @@ from app.api.scheduling.scheduling_service import (
     retrieve_all_dates_belonging_to_user,
     send_date_request_to_receiver,
     accept_date_request_from_sender,
-    reject_date_request_from_sender
+    reject_date_request_from_sender,
+    retrieve_busy_intervals
 )
 from app.api.scheduling.scheduling_models import (
     ScheduledDateRequestModel,
     ScheduledDateModelResponse,
+    BusyIntervalModel,
     DateStatus
 )
 
@@ -28,13 +30,26 @@ scheduling_router = APIRouter()
 
 @scheduling_router.get(
     "/list-dates",
-    response_model=List[ScheduledDateModel]
+    response_model=List[HydratedScheduledDateModel]
 )
 async def get_schedule_requests(
     status: DateStatus = Query(...),
-    user: User = Depends(get_user_with_roles([Roles.BASE_USER]))
+    include_restaurant: bool = Query(False, alias="includeRestaurant"),
+    limit: int = Query(50, gt=0, le=200),
+    after: Optional[PyObjectId] = Query(None),
+    start: Optional[DateTime] = Query(None, alias="from"),
+    end: Optional[DateTime] = Query(None, alias="to"),
+    user: Principal = Depends(get_user_with_roles([Roles.BASE_USER]))
 ):
-    return await retrieve_all_dates_belonging_to_user(user, status)
+    return await retrieve_all_dates_belonging_to_user(
+        user,
+        status,
+        include_restaurant,
+        limit,
+        after,
+        start,
+        end
+    )
 
 
 @scheduling_router.post(
@@ -44,7 +59,7 @@ async def get_schedule_requests(
 async def send_date_request(
     request: ScheduledDateRequestModel,
     receiver_id: PyObjectId = Path(..., alias="receiverId"),
-    user: User = Depends(get_user_with_roles([Roles.BASE_USER]))
+    user: Principal = Depends(get_user_with_roles([Roles.BASE_USER]))
 ):
     return await send_date_request_to_receiver(request, user, receiver_id)
 
@@ -55,7 +70,7 @@ async def send_date_request(
 )
 async def accept_date_request(
     schedule_id: PyObjectId = Path(..., alias="scheduleId"),
-    user: User = Depends(get_user_with_roles([Roles.BASE_USER]))
+    user: Principal = Depends(get_user_with_roles([Roles.BASE_USER]))
 ):
     return await accept_date_request_from_sender(schedule_id, user)
 
@@ -66,6 +81,19 @@ async def accept_date_request(
 )
 async def reject_date_request(
     schedule_id: PyObjectId = Path(..., alias="scheduleId"),
-    user: User = Depends(get_user_with_roles([Roles.BASE_USER]))
+    user: Principal = Depends(get_user_with_roles([Roles.BASE_USER]))
 ):
     return await reject_date_request_from_sender(schedule_id, user)
+
+
+@scheduling_router.get(
+    "/free-busy",
+    response_model=List[BusyIntervalModel]
+)
+async def get_busy_intervals(
+    start: DateTime = Query(..., alias="from"),
+    end: DateTime = Query(..., alias="to"),
+    user_id: Optional[PyObjectId] = Query(None, alias="userId"),
+    user: Principal = Depends(get_user_with_roles([Roles.BASE_USER]))
+):
+    return await retrieve_busy_intervals(user, user_id, start, end)
@@ -10,7 +10,12 @@ from app.db.model_utils import (
     DateTime
 )
 
-from app.api.restaurant.restaurant_models import RestaurantModel
+from app.settings import settings
+
+from app.api.restaurant.restaurant_models import (
+    RestaurantModel,
+    RestaurantSnapshotModel
+)
 
 
 class DressCategory(str, Enum):
@@ -24,6 +29,8 @@ class DateStatus(IntEnum):
     PENDING = 0
     REJECTED = 1
     APPROVED = 2
+    # Still pending when its meet time passed
+    EXPIRED = 3
 
 
 class BaseScheduledDateModel(CustomModel):
@@ -34,20 +41,47 @@ class BaseScheduledDateModel(CustomModel):
 
 class ScheduledDateRequestModel(BaseScheduledDateModel):
     restaurant_id: PyObjectId = Field(..., alias="restaurantId")
+    duration_minutes: int = Field(
+        default=settings.DATE_DEFAULT_DURATION_MINUTES,
+        gt=0,
+        le=settings.DATE_MAX_DURATION_MINUTES,
+        alias="durationMinutes"
+    )
 
 
 class ScheduledDateModel(BaseScheduledDateModel):
     id: Optional[PyObjectId] = Field(..., alias="_id")
+    meet_end_time: Optional[DateTime] = Field(
+        default=None,
+        alias="meetEndTime"
+    )
     sender_id: PyObjectId = Field(..., alias="senderId")
     receiver_id: PyObjectId = Field(..., alias="receiverId")
-    restaurant: RestaurantModel = Field(...)
+    restaurant_id: PyObjectId = Field(..., alias="restaurantId")
+    restaurant: RestaurantSnapshotModel = Field(...)
     status: DateStatus = Field(...)
 
 
+class HydratedScheduledDateModel(ScheduledDateModel):
+    # Full restaurant, only loaded when a listing asks for it
+    restaurant_details: Optional[RestaurantModel] = Field(
+        default=None,
+        alias="restaurantDetails"
+    )
+
+
 class ScheduledDateModelResponse(CustomModel):
     id: Optional[PyObjectId] = Field(..., alias="_id")
     meet_time: Optional[DateTime] = Field(..., alias="meetTime")
-    restaurant: Optional[RestaurantModel] = Field(...)
+    meet_end_time: Optional[DateTime] = Field(
+        default=None,
+        alias="meetEndTime"
+    )
+    restaurant_id: Optional[PyObjectId] = Field(
+        default=None,
+        alias="restaurantId"
+    )
+    restaurant: Optional[RestaurantSnapshotModel] = Field(...)
     dress_type: Optional[DressCategory] = Field(..., alias="dressType")
     msg: Optional[str] = Field(default=None)
     sender_id: Optional[PyObjectId] = Field(..., alias="senderId")
@@ -57,3 +91,6 @@ class ScheduledDateModelResponse(CustomModel):
     request_msg: str = Field(..., alias="requestMsg")
 
 
+class BusyIntervalModel(CustomModel):
+    start: datetime = Field(...)
+    end: datetime = Field(...)
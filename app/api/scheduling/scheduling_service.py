@@ -1,3 +1,7 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Optional
+
 from bson import ObjectId
 
 from fastapi import HTTPException, status
@@ -6,11 +10,18 @@ from app.db.model_utils import PyObjectId
 
 from app.db.mongo_driver import (
     dates_collection,
-    user_collection,
-    restaurant_collection
+    user_collection
 )
 
-from app.lib.auth.auth_models import User
+from app.lib.auth.auth_models import Principal
+from app.settings import settings
+
+from app.api.friends.friends_models import RelationshipKind
+from app.api.friends.relationship_service import (
+    has_relationship,
+    relationship_kinds,
+    relationship_target_ids
+)
 
 from app.api.scheduling.scheduling_models import (
     ScheduledDateRequestModel,
@@ -19,10 +30,59 @@ from app.api.scheduling.scheduling_models import (
     DateStatus
 )
 
-from app.lib.emails.email_processing import send_templated_email
+from app.api.restaurant.restaurant_service import (
+    get_restaurant_snapshot,
+    get_restaurants_by_ids
+)
+
+from app.lib.emails.outbox import enqueue_templated_email
+from app.lib.events.event_broker import event_broker
 
 
-async def _lookup_schedule(user: User, schedule_id: PyObjectId):
+def _busy_query(
+    user_ids: List[PyObjectId],
+    start: datetime,
+    end: datetime
+):
+    # Approved dates of any of the users overlapping [start, end). Durations
+    # are capped, so anything overlapping starts no earlier than start minus
+    # the maximum duration and each branch is a bounded index range scan.
+    window = {
+        "status": DateStatus.APPROVED.value,
+        "meetTime": {
+            "$gt": start - timedelta(
+                minutes=settings.DATE_MAX_DURATION_MINUTES
+            ),
+            "$lt": end
+        },
+        "meetEndTime": {"$gt": start}
+    }
+    return {"$or": [
+        {"senderId": {"$in": user_ids}, **window},
+        {"receiverId": {"$in": user_ids}, **window}
+    ]}
+
+
+async def _has_conflicting_date(
+    user_ids: List[PyObjectId],
+    start: datetime,
+    end: datetime
+):
+    conflict = await dates_collection.find_one(
+        _busy_query(user_ids, start, end),
+        {"_id": 1}
+    )
+    return conflict is not None
+
+
+def _meet_end_time(schedule: ScheduledDateModel):
+    # Dates created before durations existed get the default one
+    return schedule.meet_end_time or schedule.meet_time + timedelta(
+        minutes=settings.DATE_DEFAULT_DURATION_MINUTES
+    )
+
+
+async def _lookup_schedule(principal: Principal, schedule_id: PyObjectId):
     schedule = await dates_collection.find_one({"_id": schedule_id})
 
     if not schedule:
@@ -33,7 +93,7 @@ async def _lookup_schedule(user: User, schedule_id: PyObjectId):
 
     schedule = ScheduledDateModel(**schedule)
 
-    if schedule.receiver_id != user.id:
+    if schedule.receiver_id != principal.id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Cannot accept date."
@@ -45,7 +105,18 @@ async def _lookup_schedule(user: User, schedule_id: PyObjectId):
             detail=f"Schedule not in proper state."
         )
 
-    if schedule.sender_id in user.blocked_users:
+    # Past due but not swept yet
+    if schedule.meet_time <= datetime.utcnow():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Schedule has expired."
+        )
+
+    if await has_relationship(
+        principal.id,
+        RelationshipKind.BLOCKED,
+        schedule.sender_id
+    ):
         await dates_collection.find_one_and_delete({"_id": schedule_id})
         return False, {
             "request_msg": "You are blocked by the user, "
@@ -56,58 +127,127 @@ async def _lookup_schedule(user: User, schedule_id: PyObjectId):
     return True, schedule
 
 
-async def retrieve_all_dates_belonging_to_user(user: User, status_: DateStatus):
+async def _meet_time_window(
+    start: Optional[datetime],
+    end: Optional[datetime],
+    after: Optional[PyObjectId]
+):
+    meet_time = {}
+    if start:
+        meet_time["$gte"] = start
+    if end:
+        meet_time["$lt"] = end
+
+    if not after:
+        return {"meetTime": meet_time} if meet_time else {}
+
+    anchor = await dates_collection.find_one({"_id": after}, {"meetTime": 1})
+    if not anchor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown pagination cursor <{after}>."
+        )
+
+    # Keyset continuation on (meetTime, _id), the order the index is in
+    return {"$and": [
+        {"meetTime": meet_time} if meet_time else {},
+        {"$or": [
+            {"meetTime": {"$gt": anchor["meetTime"]}},
+            {"meetTime": anchor["meetTime"], "_id": {"$gt": after}}
+        ]}
+    ]}
+
+
+async def retrieve_all_dates_belonging_to_user(
+    principal: Principal,
+    status_: DateStatus,
+    hydrate: bool = False,
+    limit: int = 50,
+    after: Optional[PyObjectId] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    blocked_users, window = await asyncio.gather(
+        relationship_target_ids(principal.id, RelationshipKind.BLOCKED),
+        _meet_time_window(start, end, after)
+    )
     dates = await dates_collection.find(
         {
-            "receiverId": user.id,
+            "receiverId": principal.id,
             "status": status_.value,
-            "senderId": {"$nin": user.blocked_users}
+            "senderId": {"$nin": blocked_users},
+            **window
         }
-    ).to_list(length=None)
+    ).sort([("meetTime", 1), ("_id", 1)]).limit(limit).to_list(length=None)
+
+    if hydrate:
+        restaurants = await get_restaurants_by_ids(
+            list({date["restaurantId"] for date in dates})
+        )
+        for date in dates:
+            date["restaurantDetails"] = restaurants.get(date["restaurantId"])
 
     return dates
 
 
 async def send_date_request_to_receiver(
     request: ScheduledDateRequestModel,
-    user: User,
+    user: Principal,
     receiver_id: PyObjectId
 ):
-    user_to_receive = await user_collection.find_one({"_id": receiver_id})
+    meet_end_time = request.meet_time + timedelta(
+        minutes=request.duration_minutes
+    )
 
-    if user_to_receive:
-        user_to_receive = User(**user_to_receive)
-    else:
+    # The lookups only depend on the request, run them concurrently
+    user_to_receive, receiver_relationships, restaurant, conflict = \
+        await asyncio.gather(
+            user_collection.find_one({"_id": receiver_id}, {"_id": 1}),
+            relationship_kinds(
+                receiver_id,
+                user.id,
+                [RelationshipKind.BLOCKED, RelationshipKind.FRIEND]
+            ),
+            get_restaurant_snapshot(request.restaurant_id),
+            _has_conflicting_date(
+                [user.id, receiver_id],
+                request.meet_time,
+                meet_end_time
+            )
+        )
+
+    if not user_to_receive:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with id {receiver_id} not found."
         )
 
-    if user.id in user_to_receive.blocked_users:
+    if RelationshipKind.BLOCKED in receiver_relationships:
         return {
-            "request": "You are blocked by the user, "
-                       "did not send request",
+            "request_msg": "You are blocked by the user, "
+                           "did not send request",
             "success": False
         }
 
-    if user.id not in user_to_receive.friends:
+    if RelationshipKind.FRIEND not in receiver_relationships:
         return {
             "request_msg": "You are not friends with the user, "
                            "please send a friend request to proceed.",
             "success": False
         }
 
-    restaurant = await restaurant_collection.find_one(
-        {"_id": request.restaurant_id}
-    )
-
     if not restaurant:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Restaurant id <{request.restaurant_id}> not found."
         )
 
-    request.restaurant_id = None
+    if conflict:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The date overlaps an approved date of yours "
+                   "or the receiver's, did not send request"
+        )
 
     scheduled_date = ScheduledDateModel(
         id=ObjectId(),
@@ -115,36 +255,55 @@ async def send_date_request_to_receiver(
         sender_id=user.id,
         status=DateStatus.PENDING,
         restaurant=restaurant,
-        **request.dict(exclude_unset=True)
+        meet_end_time=meet_end_time,
+        **request.dict(exclude_unset=True, exclude={"duration_minutes"})
     )
 
-    scheduled_date.id = ObjectId()
-
-    res = await dates_collection.insert_one(
-        scheduled_date.dict(by_alias=True)
-    )
-
-    created_date = await dates_collection.find_one({"_id": res.inserted_id})
+    await dates_collection.insert_one(scheduled_date.dict(by_alias=True))
+    await event_broker.publish(receiver_id, "dateProposal", {
+        "scheduleId": scheduled_date.id,
+        "senderId": user.id,
+        "senderEmail": user.email,
+        "meetTime": scheduled_date.meet_time
+    })
 
     return ScheduledDateModelResponse(
         success=True,
         request_msg="Date sent successfully to the receiver.",
-        **created_date
+        **scheduled_date.dict()
     )
 
 
 async def accept_date_request_from_sender(
     schedule_id: PyObjectId,
-    user: User
+    user: Principal
 ):
     success, res = await _lookup_schedule(user, schedule_id)
 
     if not success:
         return res
 
-    await dates_collection.find_one_and_update(
-        {"_id": schedule_id},
-        {"$set": {"status": DateStatus.APPROVED}}
+    meet_end_time = _meet_end_time(res)
+    if await _has_conflicting_date(
+        [res.sender_id, res.receiver_id],
+        res.meet_time,
+        meet_end_time
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The date overlaps an approved date of yours "
+                   "or the sender's, did not accept it"
+        )
+
+    _, sender = await asyncio.gather(
+        dates_collection.update_one(
+            {"_id": schedule_id},
+            {"$set": {
+                "status": DateStatus.APPROVED,
+                "meetEndTime": meet_end_time
+            }}
+        ),
+        user_collection.find_one({"_id": res.sender_id}, {"email": 1})
     )
 
     res = ScheduledDateModelResponse(
@@ -153,14 +312,17 @@ async def accept_date_request_from_sender(
         **res.dict()
     )
 
-    sender = await user_collection.find_one({"_id": res.sender_id})
-
-    send_templated_email(
+    await enqueue_templated_email(
         "accepted_date.html",
         f"Your Date Has Been Accepted!",
         [sender["email"]],
         user_email=user.email
     )
+    await event_broker.publish(res.sender_id, "dateAccepted", {
+        "scheduleId": schedule_id,
+        "receiverId": user.id,
+        "receiverEmail": user.email
+    })
 
     res.status = DateStatus.APPROVED
     return res
@@ -168,16 +330,19 @@ async def accept_date_request_from_sender(
 
 async def reject_date_request_from_sender(
     schedule_id: PyObjectId,
-    user: User
+    user: Principal
 ):
     success, res = await _lookup_schedule(user, schedule_id)
 
     if not success:
         return res
 
-    await dates_collection.find_one_and_update(
-        {"_id": schedule_id},
-        {"$set": {"status": DateStatus.REJECTED}}
+    _, sender = await asyncio.gather(
+        dates_collection.update_one(
+            {"_id": schedule_id},
+            {"$set": {"status": DateStatus.REJECTED}}
+        ),
+        user_collection.find_one({"_id": res.sender_id}, {"email": 1})
     )
 
     res = ScheduledDateModelResponse(
@@ -186,14 +351,74 @@ async def reject_date_request_from_sender(
         **res.dict()
     )
 
-    sender = await user_collection.find_one({"_id": res.sender_id})
-
-    send_templated_email(
+    await enqueue_templated_email(
         "rejected_date.html",
         f"About Your Date With {user.email}",
         [sender["email"]],
         user_email=user.email
     )
+    await event_broker.publish(res.sender_id, "dateRejected", {
+        "scheduleId": schedule_id,
+        "receiverId": user.id,
+        "receiverEmail": user.email
+    })
 
     res.status = DateStatus.REJECTED
     return res
+
+
+async def retrieve_busy_intervals(
+    principal: Principal,
+    user_id: Optional[PyObjectId],
+    start: datetime,
+    end: datetime
+):
+    user_id = user_id or principal.id
+
+    if end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The window must end after it starts."
+        )
+
+    if user_id != principal.id and not await has_relationship(
+        principal.id,
+        RelationshipKind.FRIEND,
+        user_id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only friends can see each other's busy times."
+        )
+
+    dates = await dates_collection.find(
+        _busy_query([user_id], start, end),
+        {"meetTime": 1, "meetEndTime": 1}
+    ).sort("meetTime", 1).to_list(length=None)
+
+    return [
+        {"start": date["meetTime"], "end": date["meetEndTime"]}
+        for date in dates
+    ]
+
+
+async def expire_past_due_dates():
+    while True:
+        now = datetime.utcnow()
+        past_due = await dates_collection.find(
+            {"status": DateStatus.PENDING.value, "meetTime": {"$lt": now}},
+            {"_id": 1}
+        ).limit(settings.DATE_EXPIRY_BATCH_SIZE).to_list(length=None)
+        if not past_due:
+            return
+
+        await dates_collection.update_many(
+            {
+                "_id": {"$in": [date["_id"] for date in past_due]},
+                "status": DateStatus.PENDING.value
+            },
+            {"$set": {"status": DateStatus.EXPIRED.value, "expiredAt": now}}
+        )
+
+        if len(past_due) < settings.DATE_EXPIRY_BATCH_SIZE:
+            return
@@ -0,0 +1,240 @@
+"""
+Declarative registry of every index the services rely on.
+
+Applied on startup, or ahead of a deploy with
+``python -m app.db.indexes [--check] [--replace-conflicting]``.
+"""
+import argparse
+import asyncio
+import logging
+
+from pymongo import IndexModel, ASCENDING, GEOSPHERE
+from pymongo.errors import OperationFailure
+
+from app.db.mongo_driver import db
+
+logger = logging.getLogger(__name__)
+
+INDEX_OPTIONS = (
+    "unique",
+    "sparse",
+    "expireAfterSeconds",
+    "partialFilterExpression"
+)
+
+# Error codes for an existing index with the same name or keys but
+# different options.
+INDEX_CONFLICT_CODES = (85, 86)
+
+INDEX_REGISTRY = {
+    "users": [
+        IndexModel(
+            [("email", ASCENDING)],
+            name="user_email_unique",
+            unique=True
+        )
+    ],
+    "restaurants": [
+        IndexModel(
+            [
+                ("location", GEOSPHERE),
+                ("restaurantCategory", ASCENDING),
+                ("priceRating", ASCENDING),
+                ("minMenuPrice", ASCENDING),
+                ("hasVeganItem", ASCENDING),
+                ("foodCategories", ASCENDING),
+                ("reviewCount", ASCENDING),
+                ("reviewRating", ASCENDING)
+            ],
+            name="restaurant_discovery_2dsphere"
+        )
+    ],
+    "dates": [
+        IndexModel(
+            [
+                ("receiverId", ASCENDING),
+                ("status", ASCENDING),
+                ("meetTime", ASCENDING),
+                ("_id", ASCENDING)
+            ],
+            name="date_receiver_status_meet_time"
+        ),
+        IndexModel(
+            [
+                ("senderId", ASCENDING),
+                ("status", ASCENDING),
+                ("meetTime", ASCENDING)
+            ],
+            name="date_sender_status_meet_time"
+        ),
+        # Only pending dates are indexed, so the expiry sweep stays cheap
+        # no matter how many past dates are kept
+        IndexModel(
+            [("meetTime", ASCENDING)],
+            name="date_pending_meet_time",
+            partialFilterExpression={"status": 0}
+        )
+    ],
+    "relationships": [
+        IndexModel(
+            [
+                ("ownerId", ASCENDING),
+                ("kind", ASCENDING),
+                ("targetId", ASCENDING)
+            ],
+            name="relationship_edge_unique",
+            unique=True
+        ),
+        IndexModel(
+            [("ownerId", ASCENDING), ("kind", ASCENDING), ("_id", ASCENDING)],
+            name="relationship_listing"
+        ),
+        IndexModel(
+            [
+                ("targetId", ASCENDING),
+                ("kind", ASCENDING),
+                ("ownerId", ASCENDING)
+            ],
+            name="relationship_inbound"
+        )
+    ],
+    "emailOutbox": [
+        IndexModel(
+            [("status", ASCENDING), ("nextAttemptAt", ASCENDING)],
+            name="email_outbox_due"
+        ),
+        # Delivered emails are kept for a week for troubleshooting
+        IndexModel(
+            [("sentAt", ASCENDING)],
+            name="email_outbox_sent_ttl",
+            expireAfterSeconds=7 * 24 * 60 * 60
+        )
+    ],
+    "revocations": [
+        IndexModel(
+            [("expiresAt", ASCENDING)],
+            name="revocation_expiry_ttl",
+            expireAfterSeconds=0
+        )
+    ]
+}
+
+# Indexes we used to create and now drop whenever the registry is applied.
+RETIRED_INDEXES = {
+    "restaurants": ["restaurant_location_2dsphere"],
+    "dates": ["date_receiver_status"]
+}
+
+
+class RequiredIndexError(RuntimeError):
+    pass
+
+
+def _describe(index: dict):
+    key = [(field, direction) for field, direction in index["key"].items()] \
+        if isinstance(index["key"], dict) else list(index["key"])
+    options = {
+        option: index[option] for option in INDEX_OPTIONS if option in index
+    }
+    return key, options
+
+
+async def _apply_collection_indexes(
+    collection_name: str,
+    replace_conflicting: bool
+):
+    collection = db.get_collection(collection_name)
+
+    for model in INDEX_REGISTRY.get(collection_name, []):
+        name = model.document["name"]
+        try:
+            await collection.create_indexes([model])
+            continue
+        except OperationFailure as e:
+            error = e
+
+        if error.code in INDEX_CONFLICT_CODES and replace_conflicting:
+            await collection.drop_index(name)
+            try:
+                await collection.create_indexes([model])
+                continue
+            except OperationFailure as e:
+                error = e
+
+        # Writes rely on unique indexes to reject duplicates, running
+        # without one would silently accept them
+        if model.document.get("unique"):
+            raise RequiredIndexError(
+                f"Could not create unique index <{name}> "
+                f"on <{collection_name}>: {error}"
+            ) from error
+
+        logger.warning(
+            f"Could not create index <{name}> on <{collection_name}>: {error}"
+        )
+
+    existing = await collection.index_information()
+    for name in RETIRED_INDEXES.get(collection_name, []):
+        if name in existing:
+            await collection.drop_index(name)
+
+
+async def apply_indexes(replace_conflicting: bool = False):
+    for collection_name in INDEX_REGISTRY:
+        await _apply_collection_indexes(collection_name, replace_conflicting)
+
+
+async def find_index_drift():
+    drift = []
+
+    for collection_name, models in INDEX_REGISTRY.items():
+        existing = await db.get_collection(collection_name).index_information()
+        existing.pop("_id_", None)
+
+        for model in models:
+            name = model.document["name"]
+            if name not in existing:
+                drift.append(f"{collection_name}: missing index <{name}>")
+            elif _describe(existing.pop(name)) != _describe(model.document):
+                drift.append(
+                    f"{collection_name}: index <{name}> differs from registry"
+                )
+
+        for name in existing:
+            drift.append(f"{collection_name}: unregistered index <{name}>")
+
+    return drift
+
+
+async def apply_and_check_indexes():
+    await apply_indexes()
+    for difference in await find_index_drift():
+        logger.warning(f"Index drift, {difference}")
+
+
+async def _main(check_only: bool, replace_conflicting: bool):
+    if not check_only:
+        await apply_indexes(replace_conflicting)
+
+    drift = await find_index_drift()
+    for difference in drift:
+        print(difference)
+
+    return 1 if drift else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="only report differences, do not create or drop anything"
+    )
+    parser.add_argument(
+        "--replace-conflicting",
+        action="store_true",
+        help="drop and recreate indexes whose options changed"
+    )
+    args = parser.parse_args()
+
+    raise SystemExit(asyncio.run(_main(args.check, args.replace_conflicting)))
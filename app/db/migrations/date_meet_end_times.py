@@ -0,0 +1,29 @@
+"""
+Gives dates created before durations existed a meetEndTime of meetTime plus
+the default duration, so conflict checks and free/busy see them, then
+applies the index registry. Run after date_meet_times.
+
+Run with ``python -m app.db.migrations.date_meet_end_times``.
+"""
+import asyncio
+
+from app.db.mongo_driver import dates_collection
+from app.db.indexes import apply_indexes
+from app.settings import settings
+
+
+async def migrate():
+    result = await dates_collection.update_many(
+        {"meetEndTime": {"$exists": False}, "meetTime": {"$type": "date"}},
+        [{"$set": {"meetEndTime": {"$add": [
+            "$meetTime",
+            settings.DATE_DEFAULT_DURATION_MINUTES * 60 * 1000
+        ]}}}]
+    )
+    await apply_indexes()
+    return result.modified_count
+
+
+if __name__ == "__main__":
+    count = asyncio.run(migrate())
+    print(f"Set meetEndTime on {count} date(s).")
@@ -0,0 +1,41 @@
+"""
+Converts meetTime on existing dates from the ISO strings older versions
+stored to BSON dates, then applies the index registry.
+
+Strings that do not parse are left as they are and reported, so one bad
+row neither aborts the update nor loses its original value.
+
+Run with ``python -m app.db.migrations.date_meet_times``.
+"""
+import asyncio
+
+from app.db.mongo_driver import dates_collection
+from app.db.indexes import apply_indexes
+
+
+async def migrate():
+    # Rows kept as they were by onError are not counted as modified
+    result = await dates_collection.update_many(
+        {"meetTime": {"$type": "string"}},
+        [{"$set": {
+            "meetTime": {"$dateFromString": {
+                "dateString": "$meetTime",
+                "onError": "$meetTime"
+            }}
+        }}]
+    )
+    unconverted = await dates_collection.find(
+        {"meetTime": {"$type": "string"}},
+        {"meetTime": 1}
+    ).to_list(length=None)
+
+    await apply_indexes()
+    return result.modified_count, unconverted
+
+
+if __name__ == "__main__":
+    count, unconverted = asyncio.run(migrate())
+    print(f"Converted meetTime on {count} date(s).")
+    for date in unconverted:
+        print(f"Could not convert meetTime <{date['meetTime']}> "
+              f"on date <{date['_id']}>.")
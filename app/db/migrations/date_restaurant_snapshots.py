@@ -0,0 +1,33 @@
+"""
+Replaces the full restaurant document embedded in each date with a
+restaurantId reference and the slim snapshot kept by new dates.
+
+Run with ``python -m app.db.migrations.date_restaurant_snapshots``.
+"""
+import asyncio
+
+from app.db.mongo_driver import dates_collection
+
+RESTAURANT_REFERENCE = {
+    "restaurantId": "$restaurant._id",
+    "restaurant": {
+        "name": "$restaurant.name",
+        "city": "$restaurant.city",
+        "priceRating": "$restaurant.priceRating",
+        "lat": "$restaurant.lat",
+        "long": "$restaurant.long"
+    }
+}
+
+
+async def migrate():
+    result = await dates_collection.update_many(
+        {"restaurantId": {"$exists": False}},
+        [{"$set": RESTAURANT_REFERENCE}]
+    )
+    return result.modified_count
+
+
+if __name__ == "__main__":
+    count = asyncio.run(migrate())
+    print(f"Slimmed the restaurant copy on {count} date(s).")
@@ -0,0 +1,65 @@
+"""
+Resolves users sharing an email so the unique email index can be built.
+The oldest account keeps the email, every later one is renamed to
+``<email>#duplicate-<id>``, disabled and has its tokens revoked. Nothing
+is deleted, an admin can merge or remove the renamed accounts. Then
+applies the index registry.
+
+Run with ``python -m app.db.migrations.dedupe_user_emails``.
+"""
+import asyncio
+
+from pymongo import UpdateOne
+
+from app.db.mongo_driver import user_collection
+from app.db.indexes import apply_indexes
+
+from app.api.admin.admin_models import BanReason
+from app.lib.auth.auth_service import revoke_user_tokens
+
+
+async def migrate():
+    duplicates = await user_collection.aggregate([
+        {"$sort": {"_id": 1}},
+        {"$group": {
+            "_id": "$email",
+            "users": {"$push": {
+                "_id": "$_id",
+                "email": "$email",
+                "tokenVersion": "$tokenVersion"
+            }}
+        }},
+        {"$match": {"users.1": {"$exists": True}}}
+    ]).to_list(length=None)
+
+    renamed = []
+    writes = []
+    for duplicate in duplicates:
+        kept, *others = duplicate["users"]
+        renamed += others
+        writes += [
+            UpdateOne(
+                {"_id": user["_id"]},
+                {
+                    "$set": {
+                        "email": f"{user['email']}#duplicate-{user['_id']}",
+                        "disabled": True,
+                        "banReason": BanReason.DISCRETION_OF_ADMIN,
+                        "banMsg": f"Duplicate of account <{kept['_id']}>."
+                    },
+                    "$inc": {"tokenVersion": 1}
+                }
+            )
+            for user in others
+        ]
+
+    if writes:
+        await user_collection.bulk_write(writes, ordered=False)
+        await revoke_user_tokens(renamed)
+    await apply_indexes()
+    return len(renamed)
+
+
+if __name__ == "__main__":
+    count = asyncio.run(migrate())
+    print(f"Renamed and disabled {count} duplicate account(s).")
@@ -0,0 +1,27 @@
+"""
+Backfills the derived discovery fields (location, reviewCount, minMenuPrice,
+hasVeganItem, foodCategories) on every restaurant, then applies the
+index registry.
+
+Run with ``python -m app.db.migrations.restaurant_discovery_fields``.
+"""
+import asyncio
+
+from app.db.mongo_driver import restaurant_collection
+from app.db.indexes import apply_indexes
+
+from app.api.restaurant.restaurant_service import DERIVED_RESTAURANT_FIELDS
+
+
+async def migrate():
+    result = await restaurant_collection.update_many(
+        {},
+        [{"$set": DERIVED_RESTAURANT_FIELDS}]
+    )
+    await apply_indexes()
+    return result.modified_count
+
+
+if __name__ == "__main__":
+    count = asyncio.run(migrate())
+    print(f"Backfilled discovery fields on {count} restaurant(s).")
@@ -0,0 +1,26 @@
+"""
+Adds the GeoJSON ``location`` point used by discover-restaurants to every
+restaurant stored before it existed, then applies the index registry.
+
+Run with ``python -m app.db.migrations.restaurant_locations``.
+"""
+import asyncio
+
+from app.db.mongo_driver import restaurant_collection
+from app.db.indexes import apply_indexes
+
+from app.api.restaurant.restaurant_service import LOCATION_FROM_COORDINATES
+
+
+async def migrate():
+    result = await restaurant_collection.update_many(
+        {"location": {"$exists": False}},
+        [{"$set": {"location": LOCATION_FROM_COORDINATES}}]
+    )
+    await apply_indexes()
+    return result.modified_count
+
+
+if __name__ == "__main__":
+    count = asyncio.run(migrate())
+    print(f"Added location to {count} restaurant(s).")
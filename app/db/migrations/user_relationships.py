@@ -0,0 +1,104 @@
+"""
+Moves the friends, blockedUsers and friendRequests arrays embedded in user
+documents into the relationships edge collection, then drops the arrays and
+applies the index registry.
+
+Run with ``python -m app.db.migrations.user_relationships``.
+"""
+import asyncio
+
+from pymongo import UpdateOne
+
+from app.db.mongo_driver import user_collection, relationships_collection
+from app.db.indexes import apply_indexes
+
+from app.api.friends.friends_models import RelationshipKind
+from app.api.friends.relationship_service import link
+
+BATCH_SIZE = 500
+
+LEGACY_FIELDS = ("friends", "blockedUsers", "friendRequests")
+
+
+async def _request_sender_ids(users: list):
+    emails = {
+        request["email"]
+        for user in users
+        for request in user.get("friendRequests", [])
+    }
+    senders = await user_collection.find(
+        {"email": {"$in": list(emails)}},
+        {"email": 1}
+    ).to_list(length=None)
+
+    return {sender["email"]: sender["_id"] for sender in senders}
+
+
+def _edge_writes(user: dict, sender_ids: dict):
+    writes = [
+        link(user["_id"], RelationshipKind.FRIEND, friend_id)
+        for friend_id in user.get("friends", [])
+    ]
+    writes += [
+        link(user["_id"], RelationshipKind.BLOCKED, blocked_id)
+        for blocked_id in user.get("blockedUsers", [])
+    ]
+
+    for request in user.get("friendRequests", []):
+        sender_id = sender_ids.get(request["email"])
+        if sender_id is None:
+            continue
+        writes.append(link(
+            user["_id"],
+            RelationshipKind.FRIEND_REQUEST,
+            sender_id,
+            targetEmail=request["email"],
+            msg=request.get("msg")
+        ))
+
+    return writes
+
+
+async def migrate():
+    # Edges carry the unique index that makes re-running this idempotent
+    await apply_indexes()
+
+    migrated = 0
+    legacy_query = {
+        "$or": [{field: {"$exists": True}} for field in LEGACY_FIELDS]
+    }
+    projection = {field: 1 for field in LEGACY_FIELDS}
+
+    while True:
+        users = await user_collection.find(
+            legacy_query,
+            projection
+        ).limit(BATCH_SIZE).to_list(length=None)
+        if not users:
+            break
+
+        sender_ids = await _request_sender_ids(users)
+        writes = [
+            write for user in users for write in _edge_writes(user, sender_ids)
+        ]
+        if writes:
+            await relationships_collection.bulk_write(writes, ordered=False)
+
+        await user_collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": user["_id"]},
+                    {"$unset": {field: "" for field in LEGACY_FIELDS}}
+                )
+                for user in users
+            ],
+            ordered=False
+        )
+        migrated += len(users)
+
+    return migrated
+
+
+if __name__ == "__main__":
+    count = asyncio.run(migrate())
+    print(f"Moved relationships of {count} user(s) to edge documents.")
@@ -1,4 +1,4 @@
-from datetime import date, datetime
+from datetime import date, datetime, timezone
 
 from humps import camelize
 from bson import ObjectId
@@ -41,9 +41,14 @@ class DateTime(datetime):
     def __get_validators__(cls):
         yield cls.validate
 
+    # Parsed to a native datetime so Mongo stores a BSON date that sorts and
+    # range-queries correctly. Mongo keeps naive UTC, so offsets are applied.
     @classmethod
     def validate(cls, v):
-        datetime.fromisoformat(v)
+        if not isinstance(v, datetime):
+            v = datetime.fromisoformat(v)
+        if v.tzinfo is not None:
+            v = v.astimezone(timezone.utc).replace(tzinfo=None)
         return v
 
     @classmethod
@@ -11,3 +11,6 @@ db = client.date_finder
 user_collection = db.get_collection("users")
 restaurant_collection = db.get_collection("restaurants")
 dates_collection = db.get_collection("dates")
+revocations_collection = db.get_collection("revocations")
+relationships_collection = db.get_collection("relationships")
+email_outbox_collection = db.get_collection("emailOutbox")
@@ -4,7 +4,6 @@ from enum import Enum
 from pydantic import Field, BaseModel
 
 from app.db.model_utils import PyObjectId, CustomModel
-from app.api.friends.friends_models import OperationOnUserModel
 from app.api.admin.admin_models import BanReason
 
 
@@ -17,28 +16,40 @@ class TokenData(BaseModel):
     email: Optional[str] = Field(default=None)
 
 
+class TimingStatsModel(CustomModel):
+    count: int = Field(...)
+    avg_ms: float = Field(...)
+    max_ms: float = Field(...)
+
+
+class PasswordHashingStatsModel(CustomModel):
+    pending: int = Field(...)
+    max_pending: int = Field(...)
+    queue_wait: TimingStatsModel = Field(...)
+    hash_duration: TimingStatsModel = Field(...)
+
+
 class Roles(int, Enum):
     BASE_USER = 0
     ADMIN = 1
 
 
-class User(CustomModel):
-    # Base User data
+# The slice of a user needed to authorize a request, loaded with a
+# projection so auth cost doesn't grow with the user's social graph.
+class Principal(CustomModel):
     id: PyObjectId = Field(..., alias="_id")
     email: str = Field(...)
     disabled: bool = Field(...)
+    roles: List[Roles] = Field(...)
+    # Bumped whenever the user's outstanding tokens must stop working
+    token_version: int = Field(default=0, alias="tokenVersion")
+
+
+class User(Principal):
+    # Base User data
     ban_reason: Optional[BanReason] = Field(default=None, alias="banReason")
     ban_msg: Optional[str] = Field(default=None, alias="banMsg")
     banner_id: Optional[PyObjectId] = Field(default=None, alias="bannerId")
-    roles: List[Roles] = Field(...)
-
-    # Friends related data
-    friends: List[PyObjectId] = Field(default=[])
-    blocked_users: List[PyObjectId] = Field(default=[], alias="blockedUsers")
-    friend_requests: List[OperationOnUserModel] = Field(
-        default=[],
-        alias="friendRequests"
-    )
 
 
 class DbUser(User):
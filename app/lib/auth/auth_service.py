@@ -1,3 +1,6 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
 from typing import Optional, List
 from datetime import datetime, timedelta
 
@@ -10,7 +13,15 @@ from passlib.context import CryptContext
 
 from app.db.mongo_driver import user_collection
 from app.settings import settings
-from app.lib.auth.auth_models import DbUser, TokenData, User, Roles
+from app.lib.auth.auth_models import (
+    DbUser,
+    TokenData,
+    Principal,
+    Roles
+)
+from app.lib.misc.cache import TTLCache
+from app.lib.misc.metrics import TimingMetric
+from app.lib.auth.revocations import is_token_revoked, revoke_tokens
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440
@@ -19,13 +30,87 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 1440
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Keyed by token subject (the user's email). Anything that changes a user's
+# disabled flag or roles must call invalidate_cached_principals, otherwise
+# the change only becomes visible once the entry expires.
+principal_cache = TTLCache(
+    settings.AUTH_USER_CACHE_MAX_ENTRIES,
+    settings.AUTH_USER_CACHE_TTL_SECONDS
+)
 
-def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+PRINCIPAL_PROJECTION = {
+    "email": 1,
+    "disabled": 1,
+    "roles": 1,
+    "tokenVersion": 1
+}
 
 
-def get_password_hash(password: str):
-    return pwd_context.hash(password)
+def invalidate_cached_principals(*emails: str):
+    for email in emails:
+        principal_cache.invalidate(email)
+
+
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hashing"
+)
+password_queue_wait = TimingMetric()
+password_hash_duration = TimingMetric()
+_pending_password_jobs = 0
+
+
+def _timed(fn, *args):
+    started = perf_counter()
+    result = fn(*args)
+    return started, perf_counter(), result
+
+
+# bcrypt is deliberately slow, running it inline would block the event loop
+# and every other request with it.
+async def _run_password_job(fn, *args):
+    global _pending_password_jobs
+
+    if _pending_password_jobs >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password operations in progress, "
+                   "try again shortly.",
+            headers={"Retry-After": "1"}
+        )
+
+    _pending_password_jobs += 1
+    submitted = perf_counter()
+    try:
+        started, finished, result = await asyncio.get_running_loop() \
+            .run_in_executor(password_executor, _timed, fn, *args)
+    finally:
+        _pending_password_jobs -= 1
+
+    password_queue_wait.observe(started - submitted)
+    password_hash_duration.observe(finished - started)
+    return result
+
+
+async def verify_password(plain_password: str, hashed_password: str):
+    return await _run_password_job(
+        pwd_context.verify,
+        plain_password,
+        hashed_password
+    )
+
+
+async def get_password_hash(password: str):
+    return await _run_password_job(pwd_context.hash, password)
+
+
+def get_password_hashing_stats():
+    return {
+        "pending": _pending_password_jobs,
+        "max_pending": settings.PASSWORD_HASH_MAX_PENDING,
+        "queue_wait": password_queue_wait.snapshot(),
+        "hash_duration": password_hash_duration.snapshot()
+    }
 
 
 async def get_user(email: str):
@@ -35,11 +120,21 @@ async def get_user(email: str):
     return None
 
 
+async def get_principal(email: str):
+    principal = await user_collection.find_one(
+        {"email": email},
+        PRINCIPAL_PROJECTION
+    )
+    if principal:
+        return Principal(**principal)
+    return None
+
+
 async def authenticate_user(email: str, password: str):
     user = await get_user(email)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password(password, user.hashed_password):
         return False
 
     return user
@@ -56,6 +151,29 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
+def create_user_access_token(user: Principal):
+    return create_access_token(
+        data={
+            "sub": user.email,
+            "uid": str(user.id),
+            "roles": [role.value for role in user.roles],
+            "ver": user.token_version
+        },
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
+
+async def revoke_user_tokens(users: List[dict]):
+    invalidate_cached_principals(*[user["email"] for user in users])
+    await revoke_tokens(
+        [
+            (str(user["_id"]), user.get("tokenVersion", 0) + 1)
+            for user in users
+        ],
+        timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -70,13 +188,36 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         token_data = TokenData(email=email)
     except JWTError:
         raise credentials_exception
-    user = await get_user(email=token_data.email)
-    if user is None:
-        raise credentials_exception
-    return user
+
+    # Tokens issued before the stateless claims existed fall through to the
+    # database lookup below.
+    if settings.AUTH_STATELESS_TOKENS and "uid" in payload:
+        if is_token_revoked(payload["uid"], payload.get("ver", 0)):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Banned user")
+
+        return Principal(
+            id=payload["uid"],
+            email=email,
+            disabled=False,
+            roles=payload.get("roles", []),
+            token_version=payload.get("ver", 0)
+        )
+
+    principal = principal_cache.get(token_data.email)
+    if principal is None:
+        principal = await get_principal(email=token_data.email)
+        if principal is None:
+            raise credentials_exception
+        principal_cache.set(token_data.email, principal)
+
+    return principal
 
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)):
+async def get_current_active_user(
+    current_user: Principal = Depends(get_current_user)
+):
     if current_user.disabled:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -86,7 +227,7 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
 
 def get_user_with_roles(roles: List[Roles]):
     async def get_current_active_user_with_roles(
-        current_user: User = Depends(get_current_user)
+        current_user: Principal = Depends(get_current_user)
     ):
         if Roles.ADMIN not in current_user.roles:
             if current_user.disabled:
@@ -102,7 +243,3 @@ def get_user_with_roles(roles: List[Roles]):
                     )
         return current_user
     return get_current_active_user_with_roles
-
-
-
-
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Tuple
+
+from pymongo import UpdateOne
+
+from app.db.mongo_driver import revocations_collection
+
+# user id -> (lowest token version still accepted, when the entry expires).
+# Rebuilt from the revocations collection by sync_revocations so bans made
+# on one worker reach every other worker within one sync interval.
+_revoked: Dict[str, Tuple[int, datetime]] = {}
+
+
+def is_token_revoked(user_id: str, token_version: int):
+    revocation = _revoked.get(user_id)
+    if revocation is None:
+        return False
+
+    min_version, expires_at = revocation
+    if expires_at <= datetime.utcnow():
+        _revoked.pop(user_id, None)
+        return False
+
+    return token_version < min_version
+
+
+async def revoke_tokens(
+    revocations: Iterable[Tuple[str, int]],
+    token_lifetime: timedelta
+):
+    now = datetime.utcnow()
+    expires_at = now + token_lifetime
+
+    writes = []
+    for user_id, min_version in revocations:
+        _revoked[user_id] = (
+            max(min_version, _revoked.get(user_id, (0, now))[0]),
+            expires_at
+        )
+        writes.append(UpdateOne(
+            {"_id": user_id},
+            {
+                "$max": {"minTokenVersion": min_version},
+                "$set": {"revokedAt": now, "expiresAt": expires_at}
+            },
+            upsert=True
+        ))
+
+    if writes:
+        await revocations_collection.bulk_write(writes, ordered=False)
+
+
+async def sync_revocations():
+    now = datetime.utcnow()
+    revocations = await revocations_collection.find(
+        {"expiresAt": {"$gt": now}}
+    ).to_list(length=None)
+
+    # Merge rather than replace, a revocation made locally while the query
+    # was in flight must not be dropped.
+    for revocation in revocations:
+        min_version, expires_at = _revoked.get(revocation["_id"], (0, now))
+        _revoked[revocation["_id"]] = (
+            max(min_version, revocation["minTokenVersion"]),
+            max(expires_at, revocation["expiresAt"])
+        )
+
+    for user_id, (_, expires_at) in list(_revoked.items()):
+        if expires_at <= now:
+            del _revoked[user_id]
@@ -1,48 +1,99 @@
-from fastapi import HTTPException, status
-
+import asyncio
+import logging
 import smtplib
 
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from pathlib import Path
+from typing import List, Optional, Tuple
 
 from jinja2 import (
     Environment,
+    FileSystemBytecodeCache,
     FileSystemLoader,
     select_autoescape
 )
 
+from app.lib.emails.smtp_pool import SMTPPool
 from app.settings import settings
 
+logger = logging.getLogger(__name__)
+
+
+TEMPLATES_DIR = Path(__file__).resolve().parents[2] / "email_templates"
+
+REQUIRED_TEMPLATES = ("accepted_date.html", "rejected_date.html")
+
+# Compiled templates stay in the environment's memory cache, the bytecode
+# cache lets new processes skip compilation as well. Templates do not
+# change while the app runs, so modification checks are off.
+template_env = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=select_autoescape(['html', 'xml']),
+    bytecode_cache=FileSystemBytecodeCache(),
+    auto_reload=False
+)
+
+
+# Called on startup so a missing or broken template stops the boot instead
+# of failing an email later.
+def load_email_templates():
+    for template in {*REQUIRED_TEMPLATES, *template_env.list_templates()}:
+        template_env.get_template(template)
 
-def send_templated_email(template, subject, to, **kwargs):
-    env = Environment(
-        loader=FileSystemLoader('app/email_templates'),
-        autoescape=select_autoescape(['html', 'xml'])
-    )
-    template = env.get_template(template)
-    _send_email(to, subject, template.render(**kwargs))
 
+def render_template(template, **kwargs):
+    return template_env.get_template(template).render(**kwargs)
 
-def _send_email(to, subj, body):
 
+async def render_template_async(template, **kwargs):
+    return await asyncio.to_thread(render_template, template, **kwargs)
+
+
+def _build_message(to, subj, body):
     msg = MIMEMultipart('alternative')
     msg['From'] = settings.GMAIL_USER
     msg['Subject'] = subj
     msg['To'] = ','.join(to)
 
     msg.attach(MIMEText(body, 'html', 'utf-8'))
+    return msg
+
+
+smtp_pool = SMTPPool(
+    settings.SMTP_HOST,
+    settings.SMTP_PORT,
+    settings.SMTP_STARTTLS,
+    settings.GMAIL_USER,
+    settings.GMAIL_PASSWORD,
+    settings.SMTP_POOL_SIZE,
+    settings.SMTP_IDLE_CHECK_SECONDS,
+    settings.SMTP_MAX_MESSAGES_PER_SESSION,
+    settings.SMTP_TIMEOUT_SECONDS
+)
+
+
+# Sends (to, subject, body) messages over pooled sessions and returns the
+# error for each message, None when it was delivered. Blocking, call it from
+# a worker thread.
+def send_emails(
+    messages: List[Tuple[List[str], str, str]]
+) -> List[Optional[Exception]]:
+    if settings.EMAIL_BACKEND == "console":
+        for to, subj, body in messages:
+            logger.info(f"Email to {to}: {subj}\n{body}")
+        return [None] * len(messages)
+
+    errors = []
+    for to, subj, body in messages:
+        try:
+            smtp_pool.sendmail(
+                settings.GMAIL_USER,
+                to,
+                _build_message(to, subj, body).as_string()
+            )
+            errors.append(None)
+        except (smtplib.SMTPException, OSError) as e:
+            errors.append(e)
 
-    smtp = None
-    try:
-        smtp = smtplib.SMTP('smtp.gmail.com', 587)
-        smtp.starttls()
-        smtp.login(settings.GMAIL_USER, settings.GMAIL_PASSWORD)
-        smtp.sendmail(settings.GMAIL_USER, to, msg.as_string())
-    except smtplib.SMTPException:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Internal Server Error"
-        )
-    finally:
-        if smtp:
-            smtp.quit()
+    return errors
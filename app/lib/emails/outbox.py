@@ -0,0 +1,149 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+
+from app.db.mongo_driver import email_outbox_collection
+from app.lib.emails.email_processing import (
+    render_template_async,
+    send_emails
+)
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Emails are written to the outbox inside the request and delivered later by
+# deliver_pending_emails, so SMTP latency and failures never reach the
+# caller. A claimed email is leased for EMAIL_OUTBOX_CLAIM_SECONDS and picked
+# up again if its worker died before recording the result.
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+
+async def enqueue_templated_email(template, subject, to, **kwargs):
+    now = datetime.utcnow()
+    await email_outbox_collection.insert_one({
+        "_id": ObjectId(),
+        "template": template,
+        "subject": subject,
+        "to": to,
+        "context": kwargs,
+        "status": PENDING,
+        "attempts": 0,
+        "nextAttemptAt": now,
+        "createdAt": now
+    })
+
+
+async def _claim_batch():
+    now = datetime.utcnow()
+    batch = []
+
+    # Every claim counts as an attempt, so an email whose worker keeps dying
+    # before recording a result runs out of attempts like one that fails
+    await email_outbox_collection.update_many(
+        {
+            "status": SENDING,
+            "nextAttemptAt": {"$lte": now},
+            "attempts": {"$gte": settings.EMAIL_OUTBOX_MAX_ATTEMPTS}
+        },
+        {"$set": {
+            "status": FAILED,
+            "lastError": "Delivery lease expired on the last attempt"
+        }}
+    )
+
+    while len(batch) < settings.EMAIL_OUTBOX_BATCH_SIZE:
+        email = await email_outbox_collection.find_one_and_update(
+            {
+                "status": {"$in": [PENDING, SENDING]},
+                "nextAttemptAt": {"$lte": now},
+                "attempts": {"$lt": settings.EMAIL_OUTBOX_MAX_ATTEMPTS}
+            },
+            {
+                "$set": {
+                    "status": SENDING,
+                    "nextAttemptAt": now + timedelta(
+                        seconds=settings.EMAIL_OUTBOX_CLAIM_SECONDS
+                    )
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("nextAttemptAt", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if not email:
+            break
+        batch.append(email)
+
+    return batch
+
+
+async def _render_batch(batch: List[dict]):
+    bodies = await asyncio.gather(*[
+        render_template_async(email["template"], **email["context"])
+        for email in batch
+    ])
+    return [
+        (email["to"], email["subject"], body)
+        for email, body in zip(batch, bodies)
+    ]
+
+
+def _result_update(email: dict, error):
+    now = datetime.utcnow()
+    if error is None:
+        return UpdateOne(
+            {"_id": email["_id"]},
+            {"$set": {"status": SENT, "sentAt": now},
+             "$unset": {"lastError": ""}}
+        )
+
+    # The claim already counted this attempt
+    attempts = email["attempts"]
+    if attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        logger.error(f"Giving up on email <{email['_id']}>: {error}")
+        return UpdateOne(
+            {"_id": email["_id"]},
+            {"$set": {"status": FAILED, "lastError": str(error)}}
+        )
+
+    backoff = settings.EMAIL_OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1)
+    return UpdateOne(
+        {"_id": email["_id"]},
+        {"$set": {
+            "status": PENDING,
+            "nextAttemptAt": now + timedelta(seconds=backoff),
+            "lastError": str(error)
+        }}
+    )
+
+
+async def deliver_pending_emails():
+    while True:
+        batch = await _claim_batch()
+        if not batch:
+            return
+
+        try:
+            messages = await _render_batch(batch)
+            errors = await asyncio.to_thread(send_emails, messages)
+        except Exception as e:
+            logger.exception("Could not deliver outbox batch")
+            errors = [e] * len(batch)
+
+        await email_outbox_collection.bulk_write(
+            [
+                _result_update(email, error)
+                for email, error in zip(batch, errors)
+            ],
+            ordered=False
+        )
+
+        if len(batch) < settings.EMAIL_OUTBOX_BATCH_SIZE:
+            return
@@ -0,0 +1,121 @@
+import smtplib
+import threading
+from time import monotonic
+from typing import Optional
+
+
+class _Session:
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = monotonic()
+        self.messages_sent = 0
+
+
+# Keeps up to max_idle authenticated SMTP sessions open so consecutive
+# batches skip the TCP, STARTTLS and login handshake. Sessions idle for
+# longer than idle_check_seconds are probed with NOOP before being reused.
+# Thread safe, sessions are checked out from worker threads.
+class SMTPPool:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        starttls: bool,
+        username: Optional[str],
+        password: Optional[str],
+        max_idle: int,
+        idle_check_seconds: float,
+        max_messages_per_session: int,
+        timeout: float
+    ):
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.username = username
+        self.password = password
+        self.max_idle = max_idle
+        self.idle_check_seconds = idle_check_seconds
+        self.max_messages_per_session = max_messages_per_session
+        self.timeout = timeout
+
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+            raise
+        return _Session(smtp)
+
+    @staticmethod
+    def _is_alive(session: _Session):
+        try:
+            return session.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @staticmethod
+    def _close(session: _Session):
+        try:
+            session.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            session.smtp.close()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                session = self._idle.pop() if self._idle else None
+            if session is None:
+                return self._connect()
+
+            idle_for = monotonic() - session.last_used
+            if idle_for < self.idle_check_seconds or self._is_alive(session):
+                return session
+            self._close(session)
+
+    def release(self, session: _Session, healthy: bool = True):
+        session.last_used = monotonic()
+        if healthy and \
+                session.messages_sent < self.max_messages_per_session:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(session)
+                    return
+        self._close(session)
+
+    def _send_on(self, session: _Session, from_addr: str, to, msg: str):
+        try:
+            session.smtp.sendmail(from_addr, to, msg)
+        except smtplib.SMTPServerDisconnected:
+            self._close(session)
+            raise
+        except smtplib.SMTPException:
+            # Rejected recipients or content, the session itself is fine
+            session.messages_sent += 1
+            self.release(session)
+            raise
+        except OSError:
+            self._close(session)
+            raise
+
+        session.messages_sent += 1
+        self.release(session)
+
+    def sendmail(self, from_addr: str, to, msg: str):
+        try:
+            self._send_on(self.acquire(), from_addr, to, msg)
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped the session, retry once on a fresh one
+            self._send_on(self._connect(), from_addr, to, msg)
+
+    def close(self):
+        with self._lock:
+            sessions, self._idle = self._idle, []
+        for session in sessions:
+            self._close(session)
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Optional
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+from app.db.model_utils import PyObjectId
+from app.db.mongo_driver import db
+from app.lib.misc.background import start_periodic_task
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Delivers straight to this process's subscribers, enough for one worker.
+class InProcessEventBackend:
+    def __init__(self, dispatch: Callable[[dict], None]):
+        self.dispatch = dispatch
+
+    async def start(self):
+        pass
+
+    async def publish(self, message: dict):
+        self.dispatch(message)
+
+
+# Fans events out across workers through a capped collection every worker
+# tails, each worker then dispatches to its own subscribers.
+class MongoEventBackend:
+    COLLECTION_NAME = "events"
+
+    def __init__(self, dispatch: Callable[[dict], None]):
+        self.dispatch = dispatch
+        self.collection = db.get_collection(self.COLLECTION_NAME)
+        self._last_id = None
+
+    async def start(self):
+        try:
+            await db.create_collection(
+                self.COLLECTION_NAME,
+                capped=True,
+                size=settings.EVENTS_MONGO_CAPPED_BYTES
+            )
+        except CollectionInvalid:
+            pass
+
+        newest = await self.collection.find_one(sort=[("$natural", -1)])
+        self._last_id = newest["_id"] if newest else None
+
+        start_periodic_task(self.listen, settings.EVENTS_RECONNECT_SECONDS)
+
+    async def publish(self, message: dict):
+        await self.collection.insert_one({"_id": ObjectId(), **message})
+
+    # Returns when the tailable cursor dies, the periodic task reopens it.
+    # ObjectIds from different workers are not ordered by insertion, so the
+    # cursor is reopened from the start in natural order, which a capped
+    # collection keeps as insertion order, and skips up to the last event
+    # already dispatched. If that event has since been evicted everything
+    # left is newer and nothing is skipped.
+    async def listen(self):
+        skipping = self._last_id is not None and \
+            await self.collection.find_one({"_id": self._last_id}) is not None
+        cursor = self.collection.find(cursor_type=CursorType.TAILABLE_AWAIT)
+        while cursor.alive:
+            async for message in cursor:
+                message_id = message.pop("_id")
+                if skipping:
+                    skipping = message_id != self._last_id
+                    continue
+                self._last_id = message_id
+                self.dispatch(message)
+
+
+EVENT_BACKENDS = {
+    "memory": InProcessEventBackend,
+    "mongo": MongoEventBackend
+}
+
+
+# Per-user fan-out of server-pushed events. Each subscriber gets a bounded
+# queue, events for a subscriber that stopped reading are dropped rather
+# than buffered without limit. The last EVENTS_REPLAY_SIZE events are kept
+# so a client reconnecting with Last-Event-ID gets what it missed.
+class EventBroker:
+    def __init__(self, backend: str):
+        self._subscribers = defaultdict(set)
+        self._recent = deque(maxlen=settings.EVENTS_REPLAY_SIZE)
+        self.backend = EVENT_BACKENDS[backend](self._dispatch)
+
+    async def start(self):
+        await self.backend.start()
+
+    @contextmanager
+    def subscribe(
+        self,
+        user_id: PyObjectId,
+        last_event_id: Optional[str] = None
+    ):
+        queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+        self._subscribers[str(user_id)].add(queue)
+        if last_event_id is not None:
+            for message in self._missed_events(str(user_id), last_event_id):
+                self._deliver(queue, message)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers[str(user_id)]
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[str(user_id)]
+
+    # Nothing is replayed when last_event_id has already left the buffer,
+    # there is no telling what was missed
+    def _missed_events(self, user_id: str, last_event_id: str):
+        recent = list(self._recent)
+        for i, message in enumerate(recent):
+            if message["id"] == last_event_id:
+                return [
+                    missed for missed in recent[i + 1:]
+                    if missed["userId"] == user_id
+                ]
+        return []
+
+    @staticmethod
+    def _deliver(queue: asyncio.Queue, message: dict):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning(
+                f"Dropped <{message['type']}> event "
+                f"for user <{message['userId']}>"
+            )
+
+    def _dispatch(self, message: dict):
+        self._recent.append(message)
+        for queue in self._subscribers.get(message["userId"], ()):
+            self._deliver(queue, message)
+
+    # Never raises, a lost notification must not fail the change behind it
+    async def publish(self, user_id: PyObjectId, event_type: str, data: dict):
+        message = {
+            "id": str(ObjectId()),
+            "userId": str(user_id),
+            "type": event_type,
+            "data": jsonable_encoder(data, custom_encoder={ObjectId: str}),
+            "publishedAt": datetime.utcnow()
+        }
+        try:
+            await self.backend.publish(message)
+        except Exception:
+            logger.exception(f"Could not publish <{event_type}> event")
+
+
+event_broker = EventBroker(settings.EVENTS_BACKEND)
@@ -0,0 +1,31 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+_tasks = []
+
+
+def start_periodic_task(
+    fn: Callable[[], Awaitable],
+    interval_seconds: float
+):
+    async def run():
+        while True:
+            try:
+                await fn()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f"Periodic task <{fn.__name__}> failed")
+            await asyncio.sleep(interval_seconds)
+
+    _tasks.append(asyncio.create_task(run()))
+
+
+async def stop_background_tasks():
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
@@ -1,4 +1,12 @@
 from math import pi, sin, cos, asin, sqrt
+from typing import Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EARTH_RADIUS_KM = 6371
 
 
 def pop_from_dict(d: dict, k: str):
@@ -10,16 +18,14 @@ def _dtr(angle: float):
     return angle * (pi / 180)
 
 
-def _get_distance(c_lat: float, c_long: float, p_lat: float, p_long: float):
-    earths_radius = 6371
-
+def get_distance(c_lat: float, c_long: float, p_lat: float, p_long: float):
     d_lat = _dtr(p_lat - c_lat)
     d_long = _dtr(p_long - c_long)
 
     a = sin(d_lat/2) ** 2 + \
         (cos(_dtr(c_lat)) * cos(_dtr(p_lat))) * sin(d_long / 2) ** 2
     c = 2 * asin(sqrt(a))
-    d = earths_radius * c
+    d = EARTH_RADIUS_KM * c
 
     return d
 
@@ -31,5 +37,44 @@ def within_radius(
     p_long: float,
     radius: float
 ):
-    distance = _get_distance(c_lat, c_long, p_lat, p_long)
-    return distance < radius
+    distance = get_distance(c_lat, c_long, p_lat, p_long)
+    return distance <= radius
+
+
+def get_distances(
+    c_lat: float,
+    c_long: float,
+    p_lats: Sequence[float],
+    p_longs: Sequence[float]
+):
+    if np is None:
+        return [
+            get_distance(c_lat, c_long, p_lat, p_long)
+            for p_lat, p_long in zip(p_lats, p_longs)
+        ]
+
+    p_lats = np.radians(np.asarray(p_lats, dtype=float))
+    p_longs = np.radians(np.asarray(p_longs, dtype=float))
+    c_lat = _dtr(c_lat)
+    c_long = _dtr(c_long)
+
+    a = np.sin((p_lats - c_lat) / 2) ** 2 + \
+        cos(c_lat) * np.cos(p_lats) * np.sin((p_longs - c_long) / 2) ** 2
+    c = 2 * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+    return EARTH_RADIUS_KM * c
+
+
+def within_radius_batch(
+    c_lat: float,
+    c_long: float,
+    p_lats: Sequence[float],
+    p_longs: Sequence[float],
+    radius: float
+):
+    distances = get_distances(c_lat, c_long, p_lats, p_longs)
+
+    if np is None:
+        return [distance <= radius for distance in distances], distances
+
+    return distances <= radius, distances
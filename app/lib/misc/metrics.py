@@ -0,0 +1,18 @@
+class TimingMetric:
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "avg_ms": 1000 * self.total_seconds / self.count
+            if self.count else 0.0,
+            "max_ms": 1000 * self.max_seconds
+        }
@@ -0,0 +1,106 @@
+from math import floor, ceil, asin, sin, cos, degrees, radians
+from typing import Any, Dict, Hashable, Iterable, List, Set, Tuple
+
+from app.lib.misc.general import within_radius_batch, EARTH_RADIUS_KM
+
+
+# Uniform lat/long grid: each item lives in exactly one cell, so a radius
+# query only visits the cells overlapping the circle's bounding box.
+class SpatialGrid:
+    def __init__(self, cell_degrees: float):
+        self.cell_degrees = cell_degrees
+        self._long_cells = ceil(360 / cell_degrees)
+        self._items: Dict[
+            Hashable,
+            Tuple[float, float, Tuple[int, int], Any]
+        ] = {}
+        self._cells: Dict[Tuple[int, int], Set[Hashable]] = {}
+
+    def __len__(self):
+        return len(self._items)
+
+    def _lat_cell(self, lat: float):
+        return floor((lat + 90) / self.cell_degrees)
+
+    def _long_cell(self, long: float):
+        return floor((long + 180) / self.cell_degrees) % self._long_cells
+
+    def clear(self):
+        self._items.clear()
+        self._cells.clear()
+
+    def rebuild(self, entries: Iterable[Tuple[Hashable, float, float, Any]]):
+        self.clear()
+        for key, lat, long, item in entries:
+            self.upsert(key, lat, long, item)
+
+    def upsert(self, key: Hashable, lat: float, long: float, item: Any):
+        self.remove(key)
+        cell = (self._lat_cell(lat), self._long_cell(long))
+        self._items[key] = (lat, long, cell, item)
+        self._cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key: Hashable):
+        entry = self._items.pop(key, None)
+        if entry is None:
+            return
+
+        cell = entry[2]
+        keys = self._cells[cell]
+        keys.discard(key)
+        if not keys:
+            del self._cells[cell]
+
+    def _candidate_keys(self, lat: float, long: float, radius: float):
+        angular_radius = radius / EARTH_RADIUS_KM
+        lat_delta = degrees(angular_radius)
+
+        min_lat_cell = self._lat_cell(max(lat - lat_delta, -90))
+        max_lat_cell = self._lat_cell(min(lat + lat_delta, 90))
+
+        # Widest longitude offset reachable on the circle; near the poles
+        # (or for huge radii) the circle wraps every meridian.
+        spread = sin(angular_radius) / max(cos(radians(lat)), 1e-12)
+        if lat_delta >= 90 or abs(lat) + lat_delta >= 90 or spread >= 1:
+            long_cells = range(self._long_cells)
+        else:
+            long_delta = degrees(asin(spread))
+            first = floor((long - long_delta + 180) / self.cell_degrees)
+            last = floor((long + long_delta + 180) / self.cell_degrees)
+            if last - first + 1 >= self._long_cells:
+                long_cells = range(self._long_cells)
+            else:
+                long_cells = [
+                    i % self._long_cells for i in range(first, last + 1)
+                ]
+
+        for lat_cell in range(min_lat_cell, max_lat_cell + 1):
+            for long_cell in long_cells:
+                yield from self._cells.get((lat_cell, long_cell), ())
+
+    def nearby(
+        self,
+        lat: float,
+        long: float,
+        radius: float
+    ) -> List[Tuple[float, Any]]:
+        keys = list(self._candidate_keys(lat, long, radius))
+        entries = [self._items[key] for key in keys]
+
+        mask, distances = within_radius_batch(
+            lat,
+            long,
+            [entry[0] for entry in entries],
+            [entry[1] for entry in entries],
+            radius
+        )
+
+        found = [
+            (float(distance), str(key), entry[3])
+            for key, entry, inside, distance
+            in zip(keys, entries, mask, distances)
+            if inside
+        ]
+
+        found.sort(key=lambda entry: entry[:2])
+        return [(distance, item) for distance, _, item in found]
@@ -8,6 +8,19 @@ from app.api.restaurant.restaurant_controller import restaurant_router
 from app.api.friends.friends_controller import friends_router
 from app.api.admin.admin_controller import admin_router
 from app.api.scheduling.scheduling_controller import scheduling_router
+from app.api.events.events_controller import events_router
+
+from app.api.restaurant.restaurant_service import load_restaurant_index
+from app.api.scheduling.scheduling_service import expire_past_due_dates
+from app.db.indexes import apply_and_check_indexes
+from app.lib.auth.revocations import sync_revocations
+from app.lib.emails.outbox import deliver_pending_emails
+from app.lib.emails.email_processing import smtp_pool, load_email_templates
+from app.lib.events.event_broker import event_broker
+from app.lib.misc.background import (
+    start_periodic_task,
+    stop_background_tasks
+)
 
 
 app = FastAPI(title=settings.PROJECT_NAME)
@@ -18,6 +31,38 @@ app.include_router(restaurant_router, prefix="/restaurants", tags=["Restaurant O
 app.include_router(friends_router, prefix="/friends", tags=["Friend Operations"])
 app.include_router(admin_router, prefix="/admin", tags=["Admin Operations"])
 app.include_router(scheduling_router, tags=["Scheduling Operations"])
+app.include_router(events_router, tags=["Events"])
+
+
+@app.on_event("startup")
+async def startup():
+    load_email_templates()
+    await apply_and_check_indexes()
+    await load_restaurant_index()
+    await event_broker.start()
+
+    if settings.AUTH_STATELESS_TOKENS:
+        await sync_revocations()
+        start_periodic_task(
+            sync_revocations,
+            settings.AUTH_REVOCATION_SYNC_SECONDS
+        )
+
+    start_periodic_task(
+        deliver_pending_emails,
+        settings.EMAIL_OUTBOX_POLL_SECONDS
+    )
+    start_periodic_task(
+        expire_past_due_dates,
+        settings.DATE_EXPIRY_SWEEP_SECONDS
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await stop_background_tasks()
+    smtp_pool.close()
+
 
 app.add_middleware(
     CORSMiddleware,
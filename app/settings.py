@@ -1,5 +1,5 @@
 from pydantic import BaseSettings
-from typing import List
+from typing import List, Literal
 
 from pydantic.fields import Field
 
@@ -14,11 +14,256 @@ class Settings(BaseSettings):
     AUTH_KEY: str = Field(default="", env="AUTH_KEY")
     MONGO_URI: str = Field(default="", env="MONGO_URI")
 
+    # Authenticated users are cached per token subject for this long
+    AUTH_USER_CACHE_TTL_SECONDS: float = Field(
+        default=30,
+        gt=0,
+        env="AUTH_USER_CACHE_TTL_SECONDS"
+    )
+    AUTH_USER_CACHE_MAX_ENTRIES: int = Field(
+        default=10000,
+        gt=0,
+        env="AUTH_USER_CACHE_MAX_ENTRIES"
+    )
+
+    # Authorize from token claims alone, bans are enforced through a
+    # revocation list synced from Mongo every AUTH_REVOCATION_SYNC_SECONDS.
+    AUTH_STATELESS_TOKENS: bool = Field(
+        default=False,
+        env="AUTH_STATELESS_TOKENS"
+    )
+    AUTH_REVOCATION_SYNC_SECONDS: float = Field(
+        default=5,
+        gt=0,
+        env="AUTH_REVOCATION_SYNC_SECONDS"
+    )
+
+    # bcrypt runs on its own thread pool, requests beyond the pending limit
+    # are turned away with a 503 instead of queueing forever.
+    PASSWORD_HASH_WORKERS: int = Field(
+        default=2,
+        gt=0,
+        env="PASSWORD_HASH_WORKERS"
+    )
+    PASSWORD_HASH_MAX_PENDING: int = Field(
+        default=32,
+        gt=0,
+        env="PASSWORD_HASH_MAX_PENDING"
+    )
+
     PROJECT_NAME: str = Field(default="date-finder-be", env="PROJECT_NAME")
     PORT: str = Field(default="8080", env="PORT")
 
+    # Restaurant discovery settings
+    DISCOVERY_MODE: Literal["mongo", "memory"] = Field(
+        default="mongo",
+        env="DISCOVERY_MODE"
+    )
+    DISCOVERY_GRID_CELL_DEGREES: float = Field(
+        default=0.05,
+        gt=0,
+        env="DISCOVERY_GRID_CELL_DEGREES"
+    )
+    DISCOVERY_BATCH_SIZE: int = Field(
+        default=50,
+        gt=0,
+        env="DISCOVERY_BATCH_SIZE"
+    )
+    DISCOVERY_RANK_DISTANCE_WEIGHT: float = Field(
+        default=0.5,
+        ge=0,
+        env="DISCOVERY_RANK_DISTANCE_WEIGHT"
+    )
+    DISCOVERY_RANK_RATING_WEIGHT: float = Field(
+        default=0.35,
+        ge=0,
+        env="DISCOVERY_RANK_RATING_WEIGHT"
+    )
+    DISCOVERY_RANK_REVIEW_COUNT_WEIGHT: float = Field(
+        default=0.15,
+        ge=0,
+        env="DISCOVERY_RANK_REVIEW_COUNT_WEIGHT"
+    )
+    DISCOVERY_RANK_REVIEW_COUNT_CAP: int = Field(
+        default=500,
+        gt=0,
+        env="DISCOVERY_RANK_REVIEW_COUNT_CAP"
+    )
+
+    # Discovery result cache, queries are snapped to a grid cell center and
+    # their radius rounded up to a bucket so nearby users share entries.
+    DISCOVERY_CACHE_ENABLED: bool = Field(
+        default=False,
+        env="DISCOVERY_CACHE_ENABLED"
+    )
+    DISCOVERY_CACHE_TTL_SECONDS: float = Field(
+        default=60,
+        gt=0,
+        env="DISCOVERY_CACHE_TTL_SECONDS"
+    )
+    DISCOVERY_CACHE_MAX_ENTRIES: int = Field(
+        default=10000,
+        gt=0,
+        env="DISCOVERY_CACHE_MAX_ENTRIES"
+    )
+    DISCOVERY_CACHE_GRID_DEGREES: float = Field(
+        default=0.005,
+        gt=0,
+        env="DISCOVERY_CACHE_GRID_DEGREES"
+    )
+    DISCOVERY_CACHE_RADIUS_BUCKET_KM: float = Field(
+        default=1,
+        gt=0,
+        env="DISCOVERY_CACHE_RADIUS_BUCKET_KM"
+    )
+    # Larger searches, and areas holding more matches than the entry limit,
+    # skip the cache and run the bounded query instead.
+    DISCOVERY_CACHE_MAX_RADIUS_KM: float = Field(
+        default=25,
+        gt=0,
+        env="DISCOVERY_CACHE_MAX_RADIUS_KM"
+    )
+    DISCOVERY_CACHE_MAX_ENTRY_SIZE: int = Field(
+        default=2000,
+        gt=0,
+        env="DISCOVERY_CACHE_MAX_ENTRY_SIZE"
+    )
+
+    # "People you may know" suggestions, cached per user until one of their
+    # own edges changes or the TTL runs out.
+    FRIEND_SUGGESTIONS_LIMIT: int = Field(
+        default=50,
+        gt=0,
+        env="FRIEND_SUGGESTIONS_LIMIT"
+    )
+    FRIEND_SUGGESTIONS_CACHE_TTL_SECONDS: float = Field(
+        default=300,
+        gt=0,
+        env="FRIEND_SUGGESTIONS_CACHE_TTL_SECONDS"
+    )
+    FRIEND_SUGGESTIONS_CACHE_MAX_ENTRIES: int = Field(
+        default=10000,
+        gt=0,
+        env="FRIEND_SUGGESTIONS_CACHE_MAX_ENTRIES"
+    )
+
+    # Outgoing email is queued in Mongo and delivered by a background worker,
+    # the console backend only logs messages, for local development.
+    EMAIL_BACKEND: Literal["smtp", "console"] = Field(
+        default="smtp",
+        env="EMAIL_BACKEND"
+    )
+    EMAIL_OUTBOX_POLL_SECONDS: float = Field(
+        default=2,
+        gt=0,
+        env="EMAIL_OUTBOX_POLL_SECONDS"
+    )
+    EMAIL_OUTBOX_BATCH_SIZE: int = Field(
+        default=20,
+        gt=0,
+        env="EMAIL_OUTBOX_BATCH_SIZE"
+    )
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = Field(
+        default=5,
+        gt=0,
+        env="EMAIL_OUTBOX_MAX_ATTEMPTS"
+    )
+    EMAIL_OUTBOX_BACKOFF_SECONDS: float = Field(
+        default=30,
+        gt=0,
+        env="EMAIL_OUTBOX_BACKOFF_SECONDS"
+    )
+    EMAIL_OUTBOX_CLAIM_SECONDS: float = Field(
+        default=300,
+        gt=0,
+        env="EMAIL_OUTBOX_CLAIM_SECONDS"
+    )
+
+    # SMTP sessions are pooled and reused across outbox batches. Point host
+    # and port at a local debugging server to exercise delivery offline.
+    SMTP_HOST: str = Field(default="smtp.gmail.com", env="SMTP_HOST")
+    SMTP_PORT: int = Field(default=587, env="SMTP_PORT")
+    SMTP_STARTTLS: bool = Field(default=True, env="SMTP_STARTTLS")
+    SMTP_TIMEOUT_SECONDS: float = Field(
+        default=30,
+        gt=0,
+        env="SMTP_TIMEOUT_SECONDS"
+    )
+    SMTP_POOL_SIZE: int = Field(default=2, gt=0, env="SMTP_POOL_SIZE")
+    SMTP_IDLE_CHECK_SECONDS: float = Field(
+        default=30,
+        ge=0,
+        env="SMTP_IDLE_CHECK_SECONDS"
+    )
+    SMTP_MAX_MESSAGES_PER_SESSION: int = Field(
+        default=100,
+        gt=0,
+        env="SMTP_MAX_MESSAGES_PER_SESSION"
+    )
+
+    # A date occupies both participants from meetTime for its duration,
+    # approved dates may not overlap. The maximum also bounds how far back
+    # conflict checks have to scan.
+    DATE_DEFAULT_DURATION_MINUTES: int = Field(
+        default=120,
+        gt=0,
+        env="DATE_DEFAULT_DURATION_MINUTES"
+    )
+    DATE_MAX_DURATION_MINUTES: int = Field(
+        default=480,
+        gt=0,
+        env="DATE_MAX_DURATION_MINUTES"
+    )
+
+    # Server-pushed events. The memory backend only reaches clients connected
+    # to the same worker, mongo fans out through a capped collection.
+    EVENTS_BACKEND: Literal["memory", "mongo"] = Field(
+        default="memory",
+        env="EVENTS_BACKEND"
+    )
+    EVENTS_QUEUE_SIZE: int = Field(
+        default=100,
+        gt=0,
+        env="EVENTS_QUEUE_SIZE"
+    )
+    EVENTS_KEEPALIVE_SECONDS: float = Field(
+        default=15,
+        gt=0,
+        env="EVENTS_KEEPALIVE_SECONDS"
+    )
+    EVENTS_RECONNECT_SECONDS: float = Field(
+        default=1,
+        gt=0,
+        env="EVENTS_RECONNECT_SECONDS"
+    )
+    # Recent events kept per worker for clients reconnecting with
+    # Last-Event-ID
+    EVENTS_REPLAY_SIZE: int = Field(
+        default=1000,
+        ge=0,
+        env="EVENTS_REPLAY_SIZE"
+    )
+    EVENTS_MONGO_CAPPED_BYTES: int = Field(
+        default=16 * 1024 * 1024,
+        gt=0,
+        env="EVENTS_MONGO_CAPPED_BYTES"
+    )
+
+    # Pending proposals whose meet time has passed are marked expired by a
+    # background sweep, at most DATE_EXPIRY_BATCH_SIZE per update.
+    DATE_EXPIRY_SWEEP_SECONDS: float = Field(
+        default=60,
+        gt=0,
+        env="DATE_EXPIRY_SWEEP_SECONDS"
+    )
+    DATE_EXPIRY_BATCH_SIZE: int = Field(
+        default=500,
+        gt=0,
+        env="DATE_EXPIRY_BATCH_SIZE"
+    )
+
     GMAIL_USER: str = Field(default="", env="GMAIL_USER")
-    GMAIL_PASSWORD: str = Field(default="", env="GMAIL_USER")
+    GMAIL_PASSWORD: str = Field(default="", env="GMAIL_PASSWORD")
 
 
 settings = Settings()
@@ -0,0 +1,147 @@
+"""
+Friend suggestion latency on a seeded synthetic social graph, uncached
+and cached.
+
+Runs against a throwaway database on BENCHMARK_MONGO_URI when it is set,
+with the registry indexes applied, and against mongomock-motor otherwise.
+mongomock copies the whole edge collection on every aggregate, so its
+numbers grow with the graph rather than with a user's friends; use a
+smaller graph there and a real server for the 100k-user figures.
+
+Run with ``python -m app.tests.benchmarks.friend_suggestions [users]``.
+"""
+import asyncio
+import os
+import random
+import sys
+from statistics import quantiles
+from time import perf_counter
+from typing import Optional
+
+from bson import ObjectId
+
+# The driver builds its client at import time, it never connects here
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+from app.api.friends import friends_service, relationship_service  # noqa
+from app.api.friends.friends_models import RelationshipKind  # noqa: E402
+from app.api.friends.friends_service import (  # noqa: E402
+    get_friend_suggestions,
+    suggestions_cache
+)
+from app.db import indexes  # noqa: E402
+from app.lib.auth.auth_models import Principal, Roles  # noqa: E402
+
+
+def _edge(owner_id, kind: RelationshipKind, target_id):
+    return {
+        "_id": ObjectId(),
+        "ownerId": owner_id,
+        "kind": kind.value,
+        "targetId": target_id
+    }
+
+
+# Every user befriends friends_per_user random others (both edges), and
+# blocks and requests one other user each with a 5% chance
+async def seed(db, users: int, friends_per_user: int, rng: random.Random):
+    user_ids = [ObjectId() for _ in range(users)]
+    await db.users.insert_many([
+        {"_id": user_id, "email": f"user{i}@test.com"}
+        for i, user_id in enumerate(user_ids)
+    ])
+
+    pairs = set()
+    for i in range(users):
+        for j in rng.sample(range(users), friends_per_user):
+            if i != j:
+                pairs.add((min(i, j), max(i, j)))
+
+    edges = []
+    for i, j in pairs:
+        edges.append(_edge(user_ids[i], RelationshipKind.FRIEND, user_ids[j]))
+        edges.append(_edge(user_ids[j], RelationshipKind.FRIEND, user_ids[i]))
+    extra_kinds = (RelationshipKind.BLOCKED, RelationshipKind.FRIEND_REQUEST)
+    for i in range(users):
+        for kind in extra_kinds:
+            j = rng.randrange(users)
+            if rng.random() < 0.05 and i != j and \
+                    (min(i, j), max(i, j)) not in pairs:
+                edges.append(_edge(user_ids[i], kind, user_ids[j]))
+
+    for start in range(0, len(edges), 10000):
+        await db.relationships.insert_many(edges[start:start + 10000])
+
+    return user_ids, len(edges)
+
+
+def _percentiles(samples):
+    cuts = quantiles(samples, n=100, method="inclusive")
+    return cuts[49], cuts[98]
+
+
+async def _benchmark(db, users, friends_per_user, samples):
+    friends_service.user_collection = db.users
+    relationship_service.relationships_collection = db.relationships
+
+    rng = random.Random(7)
+    user_ids, edge_count = await seed(db, users, friends_per_user, rng)
+    principals = [
+        Principal(
+            _id=user_id,
+            email="",
+            disabled=False,
+            roles=[Roles.BASE_USER]
+        )
+        for user_id in rng.sample(user_ids, samples)
+    ]
+
+    suggestions_cache.clear()
+    uncached, cached = [], []
+    for timings in (uncached, cached):
+        for principal in principals:
+            start = perf_counter()
+            await get_friend_suggestions(principal, 10)
+            timings.append((perf_counter() - start) * 1000)
+
+    return {
+        "edges": edge_count,
+        "uncached_ms": _percentiles(uncached),
+        "cached_ms": _percentiles(cached)
+    }
+
+
+async def run(
+    users: int = 100000,
+    friends_per_user: int = 5,
+    samples: int = 100,
+    mongo_uri: Optional[str] = None
+):
+    if not mongo_uri:
+        db = AsyncMongoMockClient().date_finder
+        return await _benchmark(db, users, friends_per_user, samples)
+
+    client = AsyncIOMotorClient(mongo_uri)
+    db = client.get_database(f"benchmark_{ObjectId()}")
+    indexes.db = db
+    try:
+        await indexes.apply_indexes()
+        return await _benchmark(db, users, friends_per_user, samples)
+    finally:
+        await client.drop_database(db.name)
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    mongo_uri = os.environ.get("BENCHMARK_MONGO_URI")
+    result = asyncio.run(run(
+        users,
+        samples=100 if mongo_uri else 10,
+        mongo_uri=mongo_uri
+    ))
+    print(f"{users} users, {result['edges']} edges")
+    for name in ("uncached_ms", "cached_ms"):
+        p50, p99 = result[name]
+        print(f"{name[:-3]}: p50 {p50:.2f} ms, p99 {p99:.3f} ms")
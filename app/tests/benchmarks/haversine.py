@@ -0,0 +1,40 @@
+"""
+Scalar vs batch haversine radius filtering.
+
+Run with ``python -m app.tests.benchmarks.haversine [points]``.
+"""
+import random
+import sys
+from timeit import timeit
+
+from app.lib.misc.general import within_radius, within_radius_batch
+
+
+def run(points: int = 10000, repeat: int = 20):
+    rng = random.Random(7)
+    lats = [rng.uniform(40, 41) for _ in range(points)]
+    longs = [rng.uniform(-74, -73) for _ in range(points)]
+
+    def scalar():
+        return [
+            within_radius(40.5, -73.5, lat, long, 25)
+            for lat, long in zip(lats, longs)
+        ]
+
+    def batch():
+        return within_radius_batch(40.5, -73.5, lats, longs, 25)
+
+    return {
+        "scalar_ms": timeit(scalar, number=repeat) / repeat * 1000,
+        "batch_ms": timeit(batch, number=repeat) / repeat * 1000
+    }
+
+
+if __name__ == "__main__":
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    result = run(points)
+    print(
+        f"{points} points: scalar {result['scalar_ms']:.2f} ms, "
+        f"batch {result['batch_ms']:.2f} ms, "
+        f"{result['scalar_ms'] / result['batch_ms']:.1f}x"
+    )
@@ -0,0 +1,183 @@
+"""
+send_date_request_to_receiver latency with its independent lookups
+gathered, as shipped, against the same lookups awaited one after the
+other.
+
+Runs on mongomock-motor with a fixed delay injected before every
+database round trip, standing in for network latency to the server.
+
+Run with
+``python -m app.tests.benchmarks.send_date_proposal [latency_ms]``.
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+from statistics import quantiles
+from time import perf_counter
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+# The driver builds its client at import time, it never connects here
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+from app.api.friends import relationship_service  # noqa: E402
+from app.api.friends.friends_models import RelationshipKind  # noqa: E402
+from app.api.restaurant import restaurant_service  # noqa: E402
+from app.api.restaurant.restaurant_models import PriceRating  # noqa: E402
+from app.api.scheduling import scheduling_service  # noqa: E402
+from app.api.scheduling.scheduling_models import (  # noqa: E402
+    ScheduledDateRequestModel
+)
+from app.lib.auth.auth_models import Principal, Roles  # noqa: E402
+
+
+class _SlowCursor:
+    def __init__(self, cursor, latency: float):
+        self._cursor = cursor
+        self._latency = latency
+
+    async def to_list(self, length=None):
+        await asyncio.sleep(self._latency)
+        return await self._cursor.to_list(length=length)
+
+
+# Delays every round trip by latency seconds before running it
+class _SlowCollection:
+    def __init__(self, collection, latency: float):
+        self._collection = collection
+        self._latency = latency
+
+    def find(self, *args, **kwargs):
+        return _SlowCursor(
+            self._collection.find(*args, **kwargs),
+            self._latency
+        )
+
+    def aggregate(self, *args, **kwargs):
+        return _SlowCursor(
+            self._collection.aggregate(*args, **kwargs),
+            self._latency
+        )
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def delayed(*args, **kwargs):
+            await asyncio.sleep(self._latency)
+            return await method(*args, **kwargs)
+
+        return delayed
+
+
+async def _sequential_gather(*awaitables):
+    return [await awaitable for awaitable in awaitables]
+
+
+def _percentiles(samples):
+    cuts = quantiles(samples, n=100, method="inclusive")
+    return cuts[49], cuts[98]
+
+
+async def _seed(db):
+    sender = Principal(
+        _id=ObjectId(),
+        email="sender@test.com",
+        disabled=False,
+        roles=[Roles.BASE_USER]
+    )
+    receiver_id, restaurant_id = ObjectId(), ObjectId()
+
+    await db.users.insert_many([
+        {"_id": sender.id, "email": sender.email},
+        {"_id": receiver_id, "email": "receiver@test.com"}
+    ])
+    await db.restaurants.insert_one({
+        "_id": restaurant_id,
+        "name": "restaurant",
+        "city": "city",
+        "priceRating": PriceRating.MEDIUM.value,
+        "lat": 40.5,
+        "long": -73.5
+    })
+    await db.relationships.insert_many([
+        {
+            "_id": ObjectId(),
+            "ownerId": owner_id,
+            "kind": RelationshipKind.FRIEND.value,
+            "targetId": target_id
+        }
+        for owner_id, target_id in (
+            (sender.id, receiver_id),
+            (receiver_id, sender.id)
+        )
+    ])
+
+    return sender, receiver_id, restaurant_id
+
+
+async def _time_proposals(db, sender, receiver_id, restaurant_id, samples):
+    # Each run starts from no dates so both see the same conflict scans
+    await db.dates.delete_many({})
+    timings = []
+    for i in range(samples):
+        request = ScheduledDateRequestModel(
+            meetTime=datetime.utcnow() + timedelta(days=1 + i),
+            dressType="casual",
+            restaurantId=restaurant_id
+        )
+        start = perf_counter()
+        response = await scheduling_service.send_date_request_to_receiver(
+            request,
+            sender,
+            receiver_id
+        )
+        timings.append((perf_counter() - start) * 1000)
+        assert response.success
+    return timings
+
+
+async def run(latency_ms: float = 2, samples: int = 200):
+    db = AsyncMongoMockClient().date_finder
+    sender, receiver_id, restaurant_id = await _seed(db)
+
+    latency = latency_ms / 1000
+    scheduling_service.user_collection = _SlowCollection(db.users, latency)
+    scheduling_service.dates_collection = _SlowCollection(db.dates, latency)
+    relationship_service.relationships_collection = _SlowCollection(
+        db.relationships,
+        latency
+    )
+    restaurant_service.restaurant_collection = _SlowCollection(
+        db.restaurants,
+        latency
+    )
+
+    gathered = await _time_proposals(
+        db, sender, receiver_id, restaurant_id, samples
+    )
+
+    # Same code path with the gather replaced by one await per lookup
+    scheduling_service.asyncio = SimpleNamespace(gather=_sequential_gather)
+    try:
+        sequential = await _time_proposals(
+            db, sender, receiver_id, restaurant_id, samples
+        )
+    finally:
+        scheduling_service.asyncio = asyncio
+
+    return {
+        "sequential_ms": _percentiles(sequential),
+        "gathered_ms": _percentiles(gathered)
+    }
+
+
+if __name__ == "__main__":
+    latency_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    result = asyncio.run(run(latency_ms))
+    print(f"{latency_ms} ms per round trip")
+    for name in ("sequential_ms", "gathered_ms"):
+        p50, p99 = result[name]
+        print(f"{name[:-3]}: p50 {p50:.2f} ms, p99 {p99:.2f} ms")
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# The driver builds its client at import time, it never connects in tests
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+from app.db import mongo_driver  # noqa: E402
+
+
+# Points every module's collection handles at an in-memory database
+@pytest.fixture
+def mock_db(monkeypatch):
+    db = AsyncMongoMockClient().date_finder
+    real_collections = {
+        id(value): db.get_collection(value.name)
+        for name, value in vars(mongo_driver).items()
+        if name.endswith("_collection")
+    }
+
+    for module_name, module in list(sys.modules.items()):
+        if not module_name.startswith("app.") or module is None:
+            continue
+        for name, value in list(vars(module).items()):
+            if id(value) in real_collections:
+                monkeypatch.setattr(module, name, real_collections[id(value)])
+
+    return db
@@ -0,0 +1,69 @@
+import asyncio
+
+from bson import ObjectId
+
+from app.lib.events.event_broker import EventBroker, MongoEventBackend
+
+
+def _mongo_backend(mock_db):
+    dispatched = []
+    backend = MongoEventBackend(dispatched.append)
+    backend.collection = mock_db.events
+    return backend, dispatched
+
+
+def test_listen_resumes_in_insertion_order_not_id_order(mock_db):
+    backend, dispatched = _mongo_backend(mock_db)
+
+    # A worker with a lagging clock inserts after a newer-looking id
+    earlier_id, later_id = ObjectId(), ObjectId()
+    asyncio.run(mock_db.events.insert_many([
+        {"_id": later_id, "type": "seen"},
+        {"_id": earlier_id, "type": "missed"}
+    ]))
+    backend._last_id = later_id
+
+    asyncio.run(backend.listen())
+
+    assert [message["type"] for message in dispatched] == ["missed"]
+    assert backend._last_id == earlier_id
+
+
+def test_listen_dispatches_everything_when_last_event_was_evicted(mock_db):
+    backend, dispatched = _mongo_backend(mock_db)
+    asyncio.run(mock_db.events.insert_many([
+        {"_id": ObjectId(), "type": "first"},
+        {"_id": ObjectId(), "type": "second"}
+    ]))
+    backend._last_id = ObjectId()
+
+    asyncio.run(backend.listen())
+
+    assert [message["type"] for message in dispatched] == ["first", "second"]
+
+
+def test_reconnect_replays_events_after_last_event_id():
+    broker = EventBroker("memory")
+    user_id, other_id = ObjectId(), ObjectId()
+
+    async def publish():
+        for i, target in enumerate((user_id, other_id, user_id, user_id)):
+            await broker.publish(target, "friendRequest", {"n": i})
+
+    asyncio.run(publish())
+    first = broker._recent[0]["id"]
+
+    with broker.subscribe(user_id, first) as queue:
+        replayed = [queue.get_nowait()["data"]["n"] for _ in range(2)]
+        assert queue.empty()
+
+    assert replayed == [2, 3]
+
+
+def test_unknown_last_event_id_replays_nothing():
+    broker = EventBroker("memory")
+    user_id = ObjectId()
+    asyncio.run(broker.publish(user_id, "friendRequest", {}))
+
+    with broker.subscribe(user_id, str(ObjectId())) as queue:
+        assert queue.empty()
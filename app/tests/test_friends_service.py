@@ -0,0 +1,292 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.api.friends import friends_service
+from app.api.friends.friends_models import (
+    BulkFriendOperationItem,
+    BulkFriendOperationsModel,
+    FriendOperation,
+    OperationOnUserModel,
+    RelationshipKind
+)
+from app.api.friends.friends_service import (
+    add_to_friend_requests_of_user,
+    add_user_to_block_list,
+    add_user_to_friends_list,
+    apply_bulk_friend_operations,
+    get_friend_suggestions
+)
+from app.lib.auth.auth_models import Principal, Roles
+
+
+@pytest.fixture
+def users(mock_db):
+    principals = {}
+    for name in ("alice", "bob"):
+        principals[name] = Principal(
+            _id=ObjectId(),
+            email=f"{name}@test.com",
+            disabled=False,
+            roles=[Roles.BASE_USER]
+        )
+    asyncio.run(mock_db.users.insert_many([
+        {"_id": user.id, "email": user.email}
+        for user in principals.values()
+    ]))
+    return principals
+
+
+def _edges(mock_db):
+    edges = asyncio.run(mock_db.relationships.find().to_list(length=None))
+    return {
+        (edge["ownerId"], RelationshipKind(edge["kind"]), edge["targetId"])
+        for edge in edges
+    }
+
+
+def _about(user: Principal):
+    return OperationOnUserModel(email=user.email)
+
+
+def test_accept_without_request_links_nothing(mock_db, users):
+    alice, bob = users["alice"], users["bob"]
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(add_user_to_friends_list(bob, _about(alice)))
+
+    assert error.value.status_code == 404
+    assert _edges(mock_db) == set()
+
+
+def test_accept_links_friendship_both_ways(mock_db, users):
+    alice, bob = users["alice"], users["bob"]
+
+    asyncio.run(add_to_friend_requests_of_user(alice, _about(bob)))
+    asyncio.run(add_user_to_friends_list(bob, _about(alice)))
+
+    assert _edges(mock_db) == {
+        (alice.id, RelationshipKind.FRIEND, bob.id),
+        (bob.id, RelationshipKind.FRIEND, alice.id)
+    }
+
+
+def test_send_to_blocking_user_creates_no_request(mock_db, users):
+    alice, bob = users["alice"], users["bob"]
+
+    asyncio.run(add_user_to_block_list(bob, _about(alice)))
+    response = asyncio.run(add_to_friend_requests_of_user(alice, _about(bob)))
+
+    assert not response["friend_request_sent"]
+    assert all(
+        kind == RelationshipKind.BLOCKED for _, kind, _ in _edges(mock_db)
+    )
+
+
+def test_block_racing_accept_leaves_no_friendship(
+    mock_db,
+    users,
+    monkeypatch
+):
+    alice, bob = users["alice"], users["bob"]
+    asyncio.run(add_to_friend_requests_of_user(alice, _about(bob)))
+
+    # Alice blocks Bob right after Bob's accept passed its block check
+    real_blocked_between = friends_service.blocked_between
+    checks = []
+
+    async def blocked_between(owner_id, target_ids):
+        blocked = await real_blocked_between(owner_id, target_ids)
+        if not checks:
+            await add_user_to_block_list(alice, _about(bob))
+        checks.append(blocked)
+        return blocked
+
+    monkeypatch.setattr(friends_service, "blocked_between", blocked_between)
+    response = asyncio.run(add_user_to_friends_list(bob, _about(alice)))
+
+    assert "blocked" in response["msg"]
+    assert _edges(mock_db) == {
+        (alice.id, RelationshipKind.BLOCKED, bob.id),
+        (bob.id, RelationshipKind.BLOCKED, alice.id)
+    }
+
+
+def test_block_racing_send_withdraws_request(mock_db, users, monkeypatch):
+    alice, bob = users["alice"], users["bob"]
+
+    # Bob blocks Alice between the send's pre-check and its insert
+    real_add_relationship = friends_service.add_relationship
+
+    async def add_relationship(*args, **kwargs):
+        await add_user_to_block_list(bob, _about(alice))
+        return await real_add_relationship(*args, **kwargs)
+
+    monkeypatch.setattr(friends_service, "add_relationship", add_relationship)
+    response = asyncio.run(add_to_friend_requests_of_user(alice, _about(bob)))
+
+    assert not response["friend_request_sent"]
+    assert (bob.id, RelationshipKind.FRIEND_REQUEST, alice.id) \
+        not in _edges(mock_db)
+
+
+def test_bulk_accept_withdraws_friendship_with_blocked_user(
+    mock_db,
+    users,
+    monkeypatch
+):
+    alice, bob = users["alice"], users["bob"]
+    asyncio.run(add_to_friend_requests_of_user(alice, _about(bob)))
+
+    # Alice blocks Bob after Bob's batch read the edges it plans from
+    real_relationships_between = friends_service.relationships_between
+
+    async def relationships_between(owner_id, target_ids):
+        edges = await real_relationships_between(owner_id, target_ids)
+        await add_user_to_block_list(alice, _about(bob))
+        return edges
+
+    monkeypatch.setattr(
+        friends_service,
+        "relationships_between",
+        relationships_between
+    )
+    results = asyncio.run(apply_bulk_friend_operations(
+        bob,
+        BulkFriendOperationsModel(operations=[BulkFriendOperationItem(
+            email=alice.email,
+            operation=FriendOperation.ACCEPT_FRIEND_REQUEST
+        )])
+    ))
+
+    assert not results[0]["success"]
+    assert not any(
+        kind == RelationshipKind.FRIEND for _, kind, _ in _edges(mock_db)
+    )
+
+
+def test_concurrent_sends_create_one_request(mock_db, users):
+    alice, bob = users["alice"], users["bob"]
+
+    async def send_many():
+        return await asyncio.gather(*[
+            add_to_friend_requests_of_user(alice, _about(bob))
+            for _ in range(10)
+        ])
+
+    responses = asyncio.run(send_many())
+
+    assert sum(response["friend_request_sent"] for response in responses) == 1
+    assert _edges(mock_db) == {
+        (bob.id, RelationshipKind.FRIEND_REQUEST, alice.id)
+    }
+
+
+def test_concurrent_accepts_link_friendship_once(mock_db, users):
+    alice, bob = users["alice"], users["bob"]
+    asyncio.run(add_to_friend_requests_of_user(alice, _about(bob)))
+
+    async def accept_many():
+        return await asyncio.gather(*[
+            add_user_to_friends_list(bob, _about(alice))
+            for _ in range(10)
+        ], return_exceptions=True)
+
+    responses = asyncio.run(accept_many())
+    accepted = [r for r in responses if not isinstance(r, Exception)]
+
+    assert len(accepted) == 1
+    assert all(
+        isinstance(r, HTTPException) and r.status_code == 404
+        for r in responses if r not in accepted
+    )
+    assert _edges(mock_db) == {
+        (alice.id, RelationshipKind.FRIEND, bob.id),
+        (bob.id, RelationshipKind.FRIEND, alice.id)
+    }
+
+
+def test_concurrent_send_and_accept_keep_friendship_symmetric(
+    mock_db,
+    users
+):
+    alice, bob = users["alice"], users["bob"]
+    asyncio.run(add_to_friend_requests_of_user(alice, _about(bob)))
+
+    # Bob accepts while Alice re-sends and Bob sends a request back
+    async def race():
+        return await asyncio.gather(
+            add_user_to_friends_list(bob, _about(alice)),
+            add_to_friend_requests_of_user(alice, _about(bob)),
+            add_to_friend_requests_of_user(bob, _about(alice)),
+            add_to_friend_requests_of_user(alice, _about(bob))
+        )
+
+    asyncio.run(race())
+    edges = _edges(mock_db)
+
+    assert (alice.id, RelationshipKind.FRIEND, bob.id) in edges
+    assert (bob.id, RelationshipKind.FRIEND, alice.id) in edges
+
+
+def test_accept_for_missing_user_is_not_found(mock_db, users):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(add_user_to_friends_list(
+            users["bob"],
+            OperationOnUserModel(email="gone@test.com")
+        ))
+
+    assert error.value.status_code == 404
+
+
+def test_suggestions_exclude_self_friends_blocks_and_requests(mock_db):
+    ids = {
+        name: ObjectId() for name in (
+            "user", "friend1", "friend2", "candidate", "blocked",
+            "blocker", "received", "sent"
+        )
+    }
+    asyncio.run(mock_db.users.insert_many([
+        {"_id": user_id, "email": f"{name}@test.com"}
+        for name, user_id in ids.items()
+    ]))
+
+    edges = [("user", RelationshipKind.FRIEND, "friend1"),
+             ("user", RelationshipKind.FRIEND, "friend2"),
+             ("user", RelationshipKind.BLOCKED, "blocked"),
+             ("blocker", RelationshipKind.BLOCKED, "user"),
+             ("user", RelationshipKind.FRIEND_REQUEST, "received"),
+             ("sent", RelationshipKind.FRIEND_REQUEST, "user")]
+    # Both friends know everyone, so every exclusion would otherwise rank
+    for friend in ("friend1", "friend2"):
+        edges += [
+            (friend, RelationshipKind.FRIEND, other)
+            for other in ids if other != friend
+        ]
+    asyncio.run(mock_db.relationships.insert_many([
+        {
+            "_id": ObjectId(),
+            "ownerId": ids[owner],
+            "kind": kind.value,
+            "targetId": ids[target]
+        }
+        for owner, kind, target in edges
+    ]))
+
+    suggestions = asyncio.run(get_friend_suggestions(
+        Principal(
+            _id=ids["user"],
+            email="user@test.com",
+            disabled=False,
+            roles=[Roles.BASE_USER]
+        ),
+        10
+    ))
+
+    assert suggestions == [{
+        "id": ids["candidate"],
+        "email": "candidate@test.com",
+        "mutual_friends": 2
+    }]
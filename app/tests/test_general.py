@@ -0,0 +1,31 @@
+import pytest
+
+from app.lib.misc import general
+from app.lib.misc.general import (
+    get_distance,
+    within_radius,
+    within_radius_batch
+)
+
+POINTS = [(0.01 * i, -0.013 * i) for i in range(-50, 50)]
+
+
+def test_within_radius_includes_the_boundary():
+    distance = get_distance(0, 0, 0.01, 0.01)
+
+    assert within_radius(0, 0, 0.01, 0.01, distance)
+    assert not within_radius(0, 0, 0.01, 0.01, distance * 0.999)
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_batch_matches_scalar(monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(general, "np", None)
+
+    lats = [lat for lat, _ in POINTS]
+    longs = [long for _, long in POINTS]
+    mask, distances = within_radius_batch(0.2, -0.1, lats, longs, 50)
+
+    for (lat, long), inside, distance in zip(POINTS, mask, distances):
+        assert distance == pytest.approx(get_distance(0.2, -0.1, lat, long))
+        assert bool(inside) == within_radius(0.2, -0.1, lat, long, 50)
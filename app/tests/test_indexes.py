@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from app.api.account.account_service import create_new_account
+from app.db import indexes
+from app.db.indexes import RequiredIndexError, apply_indexes
+from app.db.migrations import dedupe_user_emails
+
+
+@pytest.fixture
+def mock_indexes_db(mock_db, monkeypatch):
+    monkeypatch.setattr(indexes, "db", mock_db)
+    return mock_db
+
+
+def test_startup_fails_when_unique_email_index_cannot_be_built(
+    mock_indexes_db
+):
+    users = mock_indexes_db.users
+    asyncio.run(users.insert_many([
+        {"email": "a@test.com", "tokenVersion": 0},
+        {"email": "a@test.com", "tokenVersion": 0}
+    ]))
+
+    with pytest.raises(RequiredIndexError):
+        asyncio.run(apply_indexes())
+
+
+def test_dedupe_keeps_oldest_account_and_enables_unique_index(
+    mock_indexes_db
+):
+    users = mock_indexes_db.users
+    asyncio.run(users.insert_many([
+        {"email": "a@test.com", "tokenVersion": 0, "disabled": False},
+        {"email": "a@test.com", "tokenVersion": 2, "disabled": False},
+        {"email": "b@test.com", "tokenVersion": 0, "disabled": False}
+    ]))
+    oldest = asyncio.run(
+        users.find_one({"email": "a@test.com"}, sort=[("_id", 1)])
+    )
+
+    assert asyncio.run(dedupe_user_emails.migrate()) == 1
+
+    kept = asyncio.run(users.find_one({"email": "a@test.com"}))
+    assert kept["_id"] == oldest["_id"]
+    renamed = asyncio.run(users.find_one({"disabled": True}))
+    assert renamed["email"] == f"a@test.com#duplicate-{renamed['_id']}"
+    assert renamed["tokenVersion"] == 3
+
+    response = asyncio.run(create_new_account("a@test.com", "password"))
+    assert not response.success
+    assert response.msg == "Email already exists."
@@ -0,0 +1,57 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app.lib.emails import outbox
+from app.lib.emails.outbox import (
+    FAILED,
+    PENDING,
+    _claim_batch,
+    deliver_pending_emails,
+    enqueue_templated_email
+)
+from app.settings import settings
+
+
+def _expire_leases(mock_db):
+    asyncio.run(mock_db.emailOutbox.update_many(
+        {},
+        {"$set": {"nextAttemptAt": datetime.utcnow() - timedelta(seconds=1)}}
+    ))
+
+
+def test_reclaiming_expired_leases_uses_up_attempts(mock_db):
+    asyncio.run(enqueue_templated_email("t.html", "subject", ["a@test.com"]))
+
+    # The worker dies after every claim, before recording a result
+    for attempt in range(1, settings.EMAIL_OUTBOX_MAX_ATTEMPTS + 1):
+        batch = asyncio.run(_claim_batch())
+        assert [email["attempts"] for email in batch] == [attempt]
+        _expire_leases(mock_db)
+
+    assert asyncio.run(_claim_batch()) == []
+    email = asyncio.run(mock_db.emailOutbox.find_one())
+    assert email["status"] == FAILED
+    assert email["attempts"] == settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+
+
+def test_failed_delivery_counts_one_attempt(mock_db, monkeypatch):
+    async def render_batch(batch):
+        return [(email["to"], email["subject"], "") for email in batch]
+
+    monkeypatch.setattr(outbox, "_render_batch", render_batch)
+    monkeypatch.setattr(
+        outbox,
+        "send_emails",
+        lambda messages: [OSError("down")] * len(messages)
+    )
+    asyncio.run(enqueue_templated_email("t.html", "subject", ["a@test.com"]))
+
+    for attempt in range(1, settings.EMAIL_OUTBOX_MAX_ATTEMPTS + 1):
+        asyncio.run(deliver_pending_emails())
+        email = asyncio.run(mock_db.emailOutbox.find_one())
+        assert email["attempts"] == attempt
+        assert email["status"] == (
+            FAILED if attempt == settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+            else PENDING
+        )
+        _expire_leases(mock_db)
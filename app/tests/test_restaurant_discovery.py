@@ -0,0 +1,194 @@
+import asyncio
+import random
+
+import pytest
+from bson import ObjectId
+
+from app.api.restaurant import restaurant_service
+from app.api.restaurant.restaurant_models import (
+    FoodCategory,
+    PriceRating,
+    RestaurantCategory
+)
+from app.api.restaurant.restaurant_service import (
+    _derived_restaurant_fields,
+    discovery_cache,
+    query_match_restaurants,
+    restaurant_index
+)
+from app.lib.misc.general import get_distance
+from app.settings import settings
+
+
+def _restaurant(lat, long, rating=4.0):
+    restaurant = {
+        "_id": ObjectId(),
+        "name": "restaurant",
+        "city": "city",
+        "reviewRating": rating,
+        "priceRating": PriceRating.MEDIUM.value,
+        "restaurantCategory": RestaurantCategory.PUB.value,
+        "reviews": [],
+        "topMenuItems": [{
+            "name": "fries",
+            "price": 10,
+            "menuCategory": "main",
+            "isVegan": True,
+            "foodCategory": FoodCategory.VEGETABLE.value
+        }],
+        "lat": lat,
+        "long": long
+    }
+    restaurant.update(_derived_restaurant_fields(restaurant))
+    return restaurant
+
+
+def _discover(lat, long, radius, max_to_display=50, ranked=False):
+    return asyncio.run(query_match_restaurants(
+        PriceRating.LOW,
+        RestaurantCategory.fields(),
+        lat,
+        long,
+        radius,
+        False,
+        0,
+        0,
+        True,
+        FoodCategory.fields(),
+        100,
+        max_to_display,
+        ranked
+    ))
+
+
+@pytest.fixture
+def memory_discovery(monkeypatch):
+    monkeypatch.setattr(settings, "DISCOVERY_MODE", "memory")
+    monkeypatch.setattr(settings, "DISCOVERY_CACHE_GRID_DEGREES", 0.005)
+    monkeypatch.setattr(settings, "DISCOVERY_CACHE_RADIUS_BUCKET_KM", 1)
+    restaurant_index.clear()
+    discovery_cache.clear()
+
+    def load(restaurants):
+        for restaurant in restaurants:
+            restaurant_service._index_restaurant(restaurant)
+
+    yield load
+
+    restaurant_index.clear()
+    discovery_cache.clear()
+
+
+def test_cached_results_respect_the_callers_origin_and_radius(
+    memory_discovery,
+    monkeypatch
+):
+    far = _restaurant(0.0045, 0.0015)
+    memory_discovery([far])
+    monkeypatch.setattr(settings, "DISCOVERY_CACHE_ENABLED", True)
+
+    # Fills the entry for the cell from another point in it
+    assert _discover(0.0049, 0.0049, 1)
+
+    restaurants = _discover(0.0001, 0.0001, 0.1)
+    assert restaurants == []
+
+    restaurants = _discover(0.0001, 0.0001, 0.6)
+    assert [r["_id"] for r in restaurants] == [far["_id"]]
+    assert restaurants[0]["distanceKm"] == pytest.approx(
+        get_distance(0.0001, 0.0001, far["lat"], far["long"])
+    )
+    assert discovery_cache.hits == 2
+
+
+@pytest.mark.parametrize("ranked", [False, True])
+def test_cached_results_match_uncached_results(
+    memory_discovery,
+    monkeypatch,
+    ranked
+):
+    rng = random.Random(3)
+    memory_discovery([
+        _restaurant(
+            rng.uniform(-0.05, 0.05),
+            rng.uniform(-0.05, 0.05),
+            rng.uniform(0, 5)
+        )
+        for _ in range(300)
+    ])
+    queries = [
+        (rng.uniform(-0.02, 0.02), rng.uniform(-0.02, 0.02),
+         rng.uniform(0.1, 4), rng.randint(1, 10))
+        for _ in range(40)
+    ]
+
+    expected = [
+        _discover(lat, long, radius, limit, ranked)
+        for lat, long, radius, limit in queries
+    ]
+    monkeypatch.setattr(settings, "DISCOVERY_CACHE_ENABLED", True)
+    cached = [
+        _discover(lat, long, radius, limit, ranked)
+        for lat, long, radius, limit in queries
+    ]
+
+    for want, got in zip(expected, cached):
+        assert [r["_id"] for r in got] == [r["_id"] for r in want]
+        for w, g in zip(want, got):
+            assert g["distanceKm"] == pytest.approx(w["distanceKm"])
+            if ranked:
+                assert g["score"] == pytest.approx(w["score"])
+
+
+def test_miss_racing_an_invalidation_is_not_cached(
+    memory_discovery,
+    monkeypatch
+):
+    nearby = _restaurant(0.001, 0.001)
+    memory_discovery([nearby])
+    monkeypatch.setattr(settings, "DISCOVERY_CACHE_ENABLED", True)
+
+    # The restaurant is updated while the miss is still scanning
+    real_candidates = restaurant_service._discovery_candidates
+
+    async def candidates(*args, **kwargs):
+        async for restaurant in real_candidates(*args, **kwargs):
+            restaurant_service._invalidate_discovery_cache(nearby)
+            yield restaurant
+
+    monkeypatch.setattr(
+        restaurant_service,
+        "_discovery_candidates",
+        candidates
+    )
+
+    assert _discover(0.0, 0.0, 1)
+    assert len(discovery_cache) == 0
+
+
+def test_large_radius_skips_the_cache(memory_discovery, monkeypatch):
+    memory_discovery([_restaurant(0.001, 0.001)])
+    monkeypatch.setattr(settings, "DISCOVERY_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "DISCOVERY_CACHE_MAX_RADIUS_KM", 5)
+
+    assert _discover(0.0, 0.0, 6)
+    assert len(discovery_cache) == 0
+    assert _discover(0.0, 0.0, 5)
+    assert len(discovery_cache) == 1
+
+
+def test_area_above_entry_size_falls_back_uncached(
+    memory_discovery,
+    monkeypatch
+):
+    memory_discovery([
+        _restaurant(0.0001 * i, 0.0001 * i, rating=i % 5) for i in range(10)
+    ])
+    expected = _discover(0.0, 0.0, 2, max_to_display=3, ranked=True)
+    monkeypatch.setattr(settings, "DISCOVERY_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "DISCOVERY_CACHE_MAX_ENTRY_SIZE", 5)
+
+    restaurants = _discover(0.0, 0.0, 2, max_to_display=3, ranked=True)
+
+    assert [r["_id"] for r in restaurants] == [r["_id"] for r in expected]
+    assert len(discovery_cache) == 0
@@ -0,0 +1,113 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.api.friends.friends_models import RelationshipKind
+from app.api.restaurant.restaurant_models import PriceRating
+from app.api.scheduling.scheduling_controller import (
+    accept_date_request,
+    send_date_request
+)
+from app.api.scheduling.scheduling_models import (
+    DateStatus,
+    ScheduledDateRequestModel
+)
+from app.lib.auth.auth_models import Principal, Roles
+
+MEET_TIME = datetime.utcnow().replace(microsecond=0) + timedelta(days=2)
+
+
+def _principal(email):
+    return Principal(
+        _id=ObjectId(),
+        email=email,
+        disabled=False,
+        roles=[Roles.BASE_USER]
+    )
+
+
+@pytest.fixture
+def dating(mock_db):
+    sender = _principal("sender@test.com")
+    receiver = _principal("receiver@test.com")
+    restaurant_id = ObjectId()
+
+    async def seed():
+        await mock_db.users.insert_many([
+            {"_id": user.id, "email": user.email}
+            for user in (sender, receiver)
+        ])
+        await mock_db.restaurants.insert_one({
+            "_id": restaurant_id,
+            "name": "restaurant",
+            "city": "city",
+            "priceRating": PriceRating.MEDIUM.value,
+            "lat": 40.5,
+            "long": -73.5
+        })
+        await mock_db.relationships.insert_many([
+            {
+                "_id": ObjectId(),
+                "ownerId": owner.id,
+                "kind": RelationshipKind.FRIEND.value,
+                "targetId": target.id
+            }
+            for owner, target in ((sender, receiver), (receiver, sender))
+        ])
+
+    asyncio.run(seed())
+    return sender, receiver, restaurant_id
+
+
+def _approve_date_for(mock_db, user):
+    asyncio.run(mock_db.dates.insert_one({
+        "_id": ObjectId(),
+        "senderId": ObjectId(),
+        "receiverId": user.id,
+        "status": DateStatus.APPROVED.value,
+        "meetTime": MEET_TIME - timedelta(minutes=30),
+        "meetEndTime": MEET_TIME + timedelta(minutes=30)
+    }))
+
+
+def _proposal(restaurant_id):
+    return ScheduledDateRequestModel(
+        meetTime=MEET_TIME,
+        dressType="casual",
+        restaurantId=restaurant_id
+    )
+
+
+def test_overlapping_proposal_is_a_conflict(mock_db, dating):
+    sender, receiver, restaurant_id = dating
+    _approve_date_for(mock_db, receiver)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(send_date_request(
+            _proposal(restaurant_id),
+            receiver.id,
+            sender
+        ))
+
+    assert error.value.status_code == 409
+    assert asyncio.run(mock_db.dates.count_documents({})) == 1
+
+
+def test_accepting_overlapping_proposal_is_a_conflict(mock_db, dating):
+    sender, receiver, restaurant_id = dating
+    sent = asyncio.run(send_date_request(
+        _proposal(restaurant_id),
+        receiver.id,
+        sender
+    ))
+    _approve_date_for(mock_db, receiver)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(accept_date_request(sent.id, receiver))
+
+    assert error.value.status_code == 409
+    date = asyncio.run(mock_db.dates.find_one({"_id": sent.id}))
+    assert date["status"] == DateStatus.PENDING.value